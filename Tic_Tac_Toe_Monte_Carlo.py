@@ -135,36 +135,312 @@ class TTTBoard:
 #end of the class TTTBoard:
 
 
+# line tables shared by every TTTBitBoard of the same dimension
+_LINE_TABLES = {}
+
+def _line_table(dim):
+    '''
+    takes a board dimension
+    returns a list indexed by square (row * dim + col) giving the indices
+    of the lines through that square; lines are numbered rows first,
+    then columns, then the main diagonal and the anti diagonal
+    '''
+    if dim not in _LINE_TABLES:
+        table = []
+        for row in range(dim):
+            for col in range(dim):
+                lines = [row, dim + col]
+                if row == col:
+                    lines.append(2 * dim)
+                if row == dim - 1 - col:
+                    lines.append(2 * dim + 1)
+                table.append(tuple(lines))
+        _LINE_TABLES[dim] = table
+    return _LINE_TABLES[dim]
+
+
+class TTTBitBoard:
+    """
+    Bitboard implementation of the TTTBoard interface.
+
+    Each player's squares are kept as the bits of an integer, and every
+    row, column and diagonal keeps a per-player counter, so move(),
+    check_win() and clone() run in constant time.
+    """
+
+    def __init__(self, dim, reverse = False, board = None):
+        """
+        Initialize the TTTBitBoard object with the given dimension and
+        whether or not the game should be reversed.
+        """
+        self._dim = dim
+        self._reverse = reverse
+        self._lines = _line_table(dim)
+        self._xbits = 0
+        self._obits = 0
+        # counters for PLAYERX lines followed by counters for PLAYERO lines
+        self._counts = [0] * (4 * dim + 4)
+        self._num_empty = dim * dim
+        self._winner = None
+
+        if board != None:
+            for row in range(dim):
+                for col in range(dim):
+                    if board[row][col] != EMPTY:
+                        self._place(row * dim + col, board[row][col])
+            # same line order as TTTBoard.check_win
+            num_lines = 2 * dim + 2
+            for line in range(num_lines):
+                if self._counts[line] == dim:
+                    self._winner = PLAYERX
+                    break
+                if self._counts[num_lines + line] == dim:
+                    self._winner = PLAYERO
+                    break
+
+    def __str__(self):
+        """
+        Human readable representation of the board.
+        """
+        signal = ""
+        for row in range(self._dim):
+            for col in range(self._dim):
+                signal += SIGNAL[self.square(row, col)]
+                if col == self._dim - 1:
+                    signal += "\n"
+                else:
+                    signal += " | "
+            if row != self._dim - 1:
+                signal += "-" * (4 * self._dim - 3)
+                signal += "\n"
+        return signal
+
+    def _place(self, index, player):
+        """
+        Mark square index for player and update the line counters.
+        Returns True if this completed one of the player's lines.
+        """
+        if player == PLAYERX:
+            self._xbits |= 1 << index
+            offset = 0
+        else:
+            self._obits |= 1 << index
+            offset = 2 * self._dim + 2
+        self._num_empty -= 1
+
+        counts = self._counts
+        completed = False
+        for line in self._lines[index]:
+            counts[offset + line] += 1
+            if counts[offset + line] == self._dim:
+                completed = True
+        return completed
+
+    def get_dim(self):
+        """
+        Return the dimension of the board.
+        """
+        return self._dim
+
+    def square(self, row, col):
+        """
+        Returns one of the three constants EMPTY, PLAYERX, or PLAYERO
+        that correspond to the contents of the board at position (row, col).
+        """
+        mask = 1 << (row * self._dim + col)
+        if self._xbits & mask:
+            return PLAYERX
+        if self._obits & mask:
+            return PLAYERO
+        return EMPTY
+
+    def get_empty_squares(self):
+        """
+        Return a list of (row, col) tuples for all empty squares
+        """
+        taken = self._xbits | self._obits
+        empty = []
+        for index in range(self._dim * self._dim):
+            if not taken & (1 << index):
+                empty.append(divmod(index, self._dim))
+        return empty
+
+    def move(self, row, col, player):
+        """
+        Place player on the board at position (row, col).
+        player should be either the constant PLAYERX or PLAYERO.
+        Does nothing if board square is not empty.
+        """
+        index = row * self._dim + col
+        if (self._xbits | self._obits) & (1 << index):
+            return
+        if self._place(index, player) and self._winner == None:
+            self._winner = player
+
+    def check_win(self):
+        """
+        Returns a constant associated with the state of the game
+            If PLAYERX wins, returns PLAYERX.
+            If PLAYERO wins, returns PLAYERO.
+            If game is drawn, returns DRAW.
+            If game is in progress, returns None.
+        """
+        if self._winner != None:
+            if self._reverse:
+                return provided.switch_player(self._winner)
+            return self._winner
+        if self._num_empty == 0:
+            return DRAW
+        return None
+
+    def clone(self):
+        """
+        Return a copy of the board.
+        """
+        cloned = TTTBitBoard(self._dim, self._reverse)
+        cloned._xbits = self._xbits
+        cloned._obits = self._obits
+        cloned._counts = self._counts[:]
+        cloned._num_empty = self._num_empty
+        cloned._winner = self._winner
+        return cloned
+
+#end of the class TTTBitBoard
+
+
 #Monte Carlo Tic-Tac-Toe Player
 
 
+import math
 import random
-import poc_ttt_gui
+import time
+from array import array
+from collections import OrderedDict
 import poc_ttt_provided as provided
 
+# numpy is only needed by the batched simulator, mc_batch_scores
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# multiprocessing is only needed by the parallel player, mc_move_parallel
+try:
+    import multiprocessing
+except ImportError:
+    multiprocessing = None
+
 # Constants for Monte Carlo simulator
 # You may change the values of these constants as desired, but
 #  do not change their names.
 NTRIALS = 1         # Number of trials to run
 SCORE_CURRENT = 1.0 # Score for squares played by the current player
 SCORE_OTHER = 1.0   # Score for squares played by the other player
+BATCH_SIZE = 4096   # Playouts simulated together by mc_batch_scores
+TRIAL_CHUNK = 250   # Trials per seeded work unit of mc_move_parallel
+CHECK_EVERY = 50    # Trials between confidence checks in mc_move_timed
+CONFIDENCE_Z = 3.0  # Width, in standard errors, of mc_move_timed's score bounds
+CACHE_SIZE = 10000  # Positions kept by the score cache of mc_move_cached
+SOLVER_CACHE_SIZE = 100000  # Positions kept by the transposition table of solver_move
+MAX_NODES = 200000  # Node limit of the MCTSPlayer search tree
+EXPLORATION = 0.2   # UCT exploration constant of MCTSPlayer
+RAVE_EQUIVALENCE = 300  # Visits over which MCTSPlayer shifts from AMAF to UCT values
     
 # Add your functions here.
-def mc_trial(board, player):
+def mc_trial(board, player, rng = random):
     '''
     takes a current board and the next player to move,
     play a game starting with the given player by making random moves, alternating between players;
     modified board will contain the state of the game, does not return anything
+    rng may be a random.Random instance to draw the moves from
     '''
     player_win = board.check_win()
     while player_win == None:
         empty = board.get_empty_squares()
-        next_move = empty[random.randrange(len(empty))]
+        next_move = empty[rng.randrange(len(empty))]
         board.move(next_move[0], next_move[1], player)
         player = provided.switch_player(player)
         player_win = board.check_win()
 
 
+class PlayoutBuffers:
+    """
+    Preallocated working storage for mc_trial_fast on boards of one dimension.
+    """
+
+    def __init__(self, dim):
+        """
+        Allocate the empty-square and line-counter buffers.
+        """
+        self.dim = dim
+        self.lines = _line_table(dim)
+        self.empty = [0] * (dim * dim)
+        # counters for the player to move first followed by the other player
+        self.counts = [0] * (4 * dim + 4)
+
+#end of the class PlayoutBuffers
+
+# buffers reused by mc_trial_fast, keyed on board dimension
+_PLAYOUT_BUFFERS = {}
+
+
+def mc_trial_fast(board, player, rng = random, buffers = None):
+    '''
+    takes a current board and the next player to move,
+    plays the same random game as mc_trial, but keeps the empty squares in
+    a preallocated array, removing each move by swapping in the last entry,
+    and detects wins with reused line counters instead of check_win;
+    modified board will contain the state of the game, does not return anything
+    '''
+    dim = board.get_dim()
+    if buffers == None:
+        buffers = _PLAYOUT_BUFFERS.get(dim)
+        if buffers == None:
+            buffers = PlayoutBuffers(dim)
+            _PLAYOUT_BUFFERS[dim] = buffers
+    lines = buffers.lines
+    empty = buffers.empty
+    counts = buffers.counts
+
+    first = player
+    second = provided.switch_player(player)
+    offset = 2 * dim + 2
+    for line in range(2 * offset):
+        counts[line] = 0
+
+    won = False
+    num_empty = 0
+    for index in range(dim * dim):
+        owner = board.square(index // dim, index % dim)
+        if owner == EMPTY:
+            empty[num_empty] = index
+            num_empty += 1
+        else:
+            base = 0 if owner == first else offset
+            for line in lines[index]:
+                counts[base + line] += 1
+                if counts[base + line] == dim:
+                    won = True
+
+    while not won and num_empty > 0:
+        pick = rng.randrange(num_empty)
+        index = empty[pick]
+        num_empty -= 1
+        empty[pick] = empty[num_empty]
+
+        board.move(index // dim, index % dim, player)
+        base = 0 if player == first else offset
+        for line in lines[index]:
+            counts[base + line] += 1
+            if counts[base + line] == dim:
+                won = True
+
+        if player == first:
+            player = second
+        else:
+            player = first
+
+
 def mc_update_scores(scores, board, player):
     '''
     takes a grid of scores (a list of lists)
@@ -191,11 +467,12 @@ def mc_update_scores(scores, board, player):
                 #0 value
                 pass
                 
-def get_best_move(board, scores):
+def get_best_move(board, scores, rng = random):
     '''
     takes a current board and a grid of scores
     find all of the empty squares with the maximum score and randomly return one of them as a (row, column) tuple
     board that has no empty squares results in error
+    rng may be a random.Random instance used to break ties
     '''
     empty_squares = board.get_empty_squares()
     if len(empty_squares)==0:
@@ -210,7 +487,7 @@ def get_best_move(board, scores):
             if scores[row][col]==max_val and (row,col) in empty_squares:
                 moves.append((row, col))
                 
-    return random.choice( moves )
+    return rng.choice( moves )
 
 
 def mc_move(board, player, trials):
@@ -231,9 +508,908 @@ def mc_move(board, player, trials):
     
 
 
+def _line_index_array(dim):
+    '''
+    takes a board dimension
+    returns a (2 * dim + 2, dim) numpy array of the flat square indices
+    of every row, column and diagonal, in TTTBoard.check_win order
+    '''
+    lines = [[row * dim + col for col in range(dim)] for row in range(dim)]
+    lines.extend([[row * dim + col for row in range(dim)] for col in range(dim)])
+    lines.append([idx * dim + idx for idx in range(dim)])
+    lines.append([idx * dim + dim - 1 - idx for idx in range(dim)])
+    return numpy.array(lines)
+
+
+def mc_batch_scores(board, player, trials, batch_size = BATCH_SIZE):
+    '''
+    takes a current board, the next player to move and the number of trials
+    plays the trials as batches of random games held in numpy arrays and
+    returns the grid of scores (a list of lists) that running mc_trial and
+    mc_update_scores once per trial would accumulate;
+    falls back to the sequential loop when numpy is not available
+    '''
+    dim = board.get_dim()
+    if numpy == None or board.check_win() != None:
+        scores = [[0 for dummy_col in range(dim)] for dummy_row in range(dim)]
+        for dummy_trial in range(trials):
+            cloned = board.clone()
+            mc_trial(cloned, player)
+            mc_update_scores(scores, cloned, player)
+        return scores
+
+    other = provided.switch_player(player)
+    cells = numpy.array([board.square(row, col) for row in range(dim)
+                         for col in range(dim)])
+    empty = numpy.flatnonzero(cells == EMPTY)
+    num_empty = len(empty)
+    lines = _line_index_array(dim)
+    never = num_empty + 1
+    reverse = getattr(board, "_reverse", False)
+
+    totals = numpy.zeros(dim * dim)
+    remaining = trials
+    while remaining > 0:
+        size = min(batch_size, remaining)
+        remaining -= size
+        games = numpy.arange(size)[:, None]
+
+        # move number at which each square gets filled, -1 if already taken
+        order = numpy.argsort(numpy.random.random((size, num_empty)), axis = 1)
+        times = numpy.full((size, dim * dim), -1)
+        times[games, empty[order]] = numpy.arange(num_empty)
+
+        owners = numpy.tile(cells, (size, 1))
+        owners[:, empty] = numpy.where(times[:, empty] % 2 == 0, player, other)
+
+        # a line is won when its last square is filled, if one player owns it
+        line_owners = owners[:, lines]
+        owned = (line_owners == line_owners[:, :, :1]).all(axis = 2)
+        finish = numpy.where(owned, times[:, lines].max(axis = 2), never)
+        end = finish.min(axis = 1)
+        drawn = end == never
+
+        winner = numpy.where(end % 2 == 0, player, other)
+        if reverse:
+            winner = numpy.where(winner == PLAYERX, PLAYERO, PLAYERX)
+
+        played = (times <= end[:, None]) & ~drawn[:, None]
+        value = numpy.where(owners == winner[:, None], SCORE_CURRENT, -SCORE_OTHER)
+        totals += numpy.where(played, value, 0.0).sum(axis = 0)
+
+    return totals.reshape(dim, dim).tolist()
+
+
+def mc_move_batch(board, player, trials):
+    '''
+    takes a current board, which player the machine player is
+    ,and the number of trials to run
+    same as mc_move, but the trials are simulated in batches by
+    mc_batch_scores
+    '''
+    return get_best_move(board, mc_batch_scores(board, player, trials))
+
+
+
+def _mc_chunk(task):
+    '''
+    takes a (board, player, trials, seed, index) work unit
+    runs the trials with a random stream seeded from (seed, index)
+    returns the partial grid of scores
+    '''
+    board, player, trials, seed, index = task
+    rng = random.Random(seed * 1000003 + index)
+    scores = [[0 for dummy_col in range(board.get_dim())] for dummy_row in range(board.get_dim())]
+    for dummy_trial in range(trials):
+        cloned = board.clone()
+        mc_trial(cloned, player, rng)
+        mc_update_scores(scores, cloned, player)
+    return scores
+
+
+def mc_move_parallel(board, player, trials, workers = None, seed = None, pool = None):
+    '''
+    takes a current board, which player the machine player is
+    ,and the number of trials to run
+    same as mc_move, but the trials are split into chunks of TRIAL_CHUNK
+    and scored on a pool of worker processes;
+    every chunk draws from its own stream seeded from seed and the chunk
+    number, so a given seed picks the same move for any number of workers
+    workers: number of processes (defaults to the cpu count), 1 runs in this process
+    pool: an existing multiprocessing.Pool to reuse across moves
+    '''
+    if seed == None:
+        seed = random.getrandbits(32)
+
+    tasks = []
+    for index, start in enumerate(range(0, trials, TRIAL_CHUNK)):
+        tasks.append((board, player, min(TRIAL_CHUNK, trials - start), seed, index))
+
+    if pool != None:
+        partials = pool.map(_mc_chunk, tasks)
+    elif workers == 1 or multiprocessing == None or len(tasks) < 2:
+        partials = [_mc_chunk(task) for task in tasks]
+    else:
+        own_pool = multiprocessing.Pool(workers)
+        try:
+            partials = own_pool.map(_mc_chunk, tasks)
+        finally:
+            own_pool.close()
+            own_pool.join()
+
+    # merge the partial grids in chunk order
+    dim = board.get_dim()
+    scores = [[0 for dummy_col in range(dim)] for dummy_row in range(dim)]
+    for partial in partials:
+        for row in range(dim):
+            for col in range(dim):
+                scores[row][col] += partial[row][col]
+
+    return get_best_move(board, scores, random.Random(seed))
+
+
+def _mc_accumulate(sums, squares, board):
+    '''
+    takes flat lists of score sums and of squared scores, and a completed board
+    adds the score of every square, as mc_update_scores assigns it,
+    to sums and its square to squares
+    '''
+    winner = board.check_win()
+    if winner != PLAYERX and winner != PLAYERO:
+        return
+    dim = board.get_dim()
+    for row in range(dim):
+        for col in range(dim):
+            owner = board.square(row, col)
+            if owner == winner:
+                value = SCORE_CURRENT
+            elif owner != EMPTY:
+                value = -SCORE_OTHER
+            else:
+                continue
+            sums[row * dim + col] += value
+            squares[row * dim + col] += value * value
+
+
+def _leader_decided(sums, squares, trials, candidates, z_score):
+    '''
+    takes the score sums and squared scores after trials playouts and the
+    flat indices of the candidate squares
+    returns True when the lower confidence bound of the best mean score is
+    above the upper bound of every other candidate
+    '''
+    bounds = []
+    for index in candidates:
+        mean = sums[index] / float(trials)
+        variance = max(squares[index] / float(trials) - mean * mean, 0.0)
+        margin = z_score * math.sqrt(variance / trials)
+        bounds.append((mean, mean - margin, mean + margin))
+    bounds.sort(reverse = True)
+    leader_low = bounds[0][1]
+    for dummy_mean, dummy_low, high in bounds[1:]:
+        if high >= leader_low:
+            return False
+    return True
+
+
+def mc_move_timed(board, player, time_budget, z_score = CONFIDENCE_Z):
+    '''
+    takes a current board, which player the machine player is
+    ,and a time budget in seconds
+    runs Monte Carlo trials until the budget is spent or the confidence
+    bounds, checked every CHECK_EVERY trials, show that the leading empty
+    square can no longer be overtaken, then returns the best move as
+    mc_move does
+    the deadline is checked before every trial, so the budget is overrun
+    by at most one playout
+    '''
+    empty_squares = board.get_empty_squares()
+    if len(empty_squares) < 2:
+        if len(empty_squares) == 1:
+            return empty_squares[0]
+        return
+
+    dim = board.get_dim()
+    candidates = [row * dim + col for row, col in empty_squares]
+    sums = [0.0] * (dim * dim)
+    squares = [0.0] * (dim * dim)
+    trials = 0
+    deadline = time.time() + time_budget
+
+    while time.time() < deadline:
+        cloned = board.clone()
+        mc_trial(cloned, player)
+        _mc_accumulate(sums, squares, cloned)
+        trials += 1
+        if trials % CHECK_EVERY == 0 and _leader_decided(sums, squares, trials, candidates, z_score):
+            break
+
+    scores = [sums[row * dim:(row + 1) * dim] for row in range(dim)]
+    return get_best_move(board, scores)
+
+
+# symmetry permutations shared by every board of the same dimension
+_SYMMETRIES = {}
+
+def _symmetries(dim):
+    '''
+    takes a board dimension
+    returns the 8 rotations and reflections of the square board, each as a
+    list perm where square index i of the transformed board is square
+    perm[i] of the original one
+    '''
+    if dim not in _SYMMETRIES:
+        last = dim - 1
+        transforms = [lambda row, col: (row, col),
+                      lambda row, col: (col, last - row),
+                      lambda row, col: (last - row, last - col),
+                      lambda row, col: (last - col, row),
+                      lambda row, col: (row, last - col),
+                      lambda row, col: (last - row, col),
+                      lambda row, col: (col, row),
+                      lambda row, col: (last - col, last - row)]
+        perms = []
+        for transform in transforms:
+            perm = []
+            for row in range(dim):
+                for col in range(dim):
+                    new_row, new_col = transform(row, col)
+                    perm.append(new_row * dim + new_col)
+            perms.append(perm)
+        _SYMMETRIES[dim] = perms
+    return _SYMMETRIES[dim]
+
+
+def canonical_board(board):
+    '''
+    takes a board
+    returns (cells, perm) where cells is the smallest tuple of square
+    contents over the 8 symmetries of the board and perm is the
+    permutation from _symmetries that produces it
+    '''
+    dim = board.get_dim()
+    flat = [board.square(row, col) for row in range(dim) for col in range(dim)]
+    best = None
+    for perm in _symmetries(dim):
+        cells = tuple([flat[index] for index in perm])
+        if best == None or cells < best[0]:
+            best = (cells, perm)
+    return best
+
+
+class ScoreCache:
+    """
+    Bounded LRU cache of Monte Carlo score grids.
+
+    Entries are keyed on the canonical form of a position and the player
+    to move, and hold the accumulated scores, in canonical square order,
+    together with the number of trials behind them.  solver_move uses
+    another instance as its transposition table, with (value, flag)
+    entries in place of (scores, trials).
+    """
+
+    def __init__(self, capacity = CACHE_SIZE):
+        """
+        Create an empty cache holding at most capacity positions.
+        """
+        self._capacity = capacity
+        self._entries = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __len__(self):
+        """
+        Return the number of cached positions.
+        """
+        return len(self._entries)
+
+    def lookup(self, key):
+        """
+        Return the (scores, trials) entry for key, or None.
+        """
+        entry = self._entries.pop(key, None)
+        if entry == None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        self._entries[key] = entry
+        return entry
+
+    def store(self, key, scores, trials):
+        """
+        Record scores and trials for key, evicting the least recently
+        used entries if the cache is full.
+        """
+        self._entries.pop(key, None)
+        self._entries[key] = (scores, trials)
+        while len(self._entries) > self._capacity:
+            self._entries.popitem(last = False)
+            self._evictions += 1
+
+    def clear(self):
+        """
+        Drop every entry and reset the counters.
+        """
+        self._entries.clear()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get_stats(self):
+        """
+        Return a dictionary with the hit, miss and eviction counters.
+        """
+        return {"hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "size": len(self._entries),
+                "capacity": self._capacity}
+
+#end of the class ScoreCache
+
+SCORE_CACHE = ScoreCache()
+
+
+def mc_move_cached(board, player, trials, cache = SCORE_CACHE):
+    '''
+    takes a current board, which player the machine player is
+    ,and the number of trials to run
+    same as mc_move, but the trials are added to the scores cached for the
+    position or any of its rotations and reflections, and the refined
+    scores are stored back in the cache
+    the scores are sums built with SCORE_CURRENT and SCORE_OTHER, so both
+    are part of the cache key
+    '''
+    dim = board.get_dim()
+    cells, perm = canonical_board(board)
+    key = (dim, getattr(board, "_reverse", False), player, cells,
+           SCORE_CURRENT, SCORE_OTHER)
+
+    flat = [0] * (dim * dim)
+    total_trials = trials
+    entry = cache.lookup(key)
+    if entry != None:
+        cached_scores, cached_trials = entry
+        for index in range(dim * dim):
+            flat[perm[index]] = cached_scores[index]
+        total_trials += cached_trials
+
+    scores = [flat[row * dim:(row + 1) * dim] for row in range(dim)]
+    for dummy_trial in range(trials):
+        cloned = board.clone()
+        mc_trial(cloned, player)
+        mc_update_scores(scores, cloned, player)
+
+    flat = [value for row in scores for value in row]
+    cache.store(key, tuple([flat[index] for index in perm]), total_trials)
+    return get_best_move(board, scores)
+
+
+# flags for the bounds kept in the solver transposition table
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# transposition table of solver_move, keyed on (dim, reverse, player, canonical cells)
+_SOLVER_TT = ScoreCache(SOLVER_CACHE_SIZE)
+
+# precomputed 3x3 tables loaded by load_solver_table, keyed on reverse
+_SOLVER_LOOKUP = {}
+UNKNOWN = 2
+
+
+def _game_value(winner, player):
+    '''
+    takes the result of check_win and the player to move
+    returns 1 if that player has won, -1 if they have lost and 0 for a draw
+    '''
+    if winner == DRAW:
+        return 0
+    if winner == player:
+        return 1
+    return -1
+
+
+def _negamax(board, player, alpha, beta, order):
+    '''
+    takes a board, the player to move, an alpha-beta window and the flat
+    square indices in the order they should be tried
+    returns the game value for player under perfect play
+    '''
+    winner = board.check_win()
+    if winner != None:
+        return _game_value(winner, player)
+
+    dim = board.get_dim()
+    key = (dim, getattr(board, "_reverse", False), player, canonical_board(board)[0])
+    entry = _SOLVER_TT.lookup(key)
+    if entry != None:
+        value, flag = entry
+        if flag == EXACT:
+            return value
+        elif flag == LOWER:
+            alpha = max(alpha, value)
+        else:
+            beta = min(beta, value)
+        if alpha >= beta:
+            return value
+
+    original_alpha = alpha
+    other = provided.switch_player(player)
+    best = -2
+    for index in order:
+        row, col = divmod(index, dim)
+        if board.square(row, col) != EMPTY:
+            continue
+        child = board.clone()
+        child.move(row, col, player)
+        value = -_negamax(child, other, -beta, -alpha, order)
+        if value > best:
+            best = value
+        if best > alpha:
+            alpha = best
+        if alpha >= beta:
+            break
+
+    if best <= original_alpha:
+        _SOLVER_TT.store(key, best, UPPER)
+    elif best >= beta:
+        _SOLVER_TT.store(key, best, LOWER)
+    else:
+        _SOLVER_TT.store(key, best, EXACT)
+    return best
+
+
+def _table_index(board):
+    '''
+    takes a 3x3 board
+    returns its position in a solver table, with square i as base 3 digit i
+    '''
+    index = 0
+    for row in range(2, -1, -1):
+        for col in range(2, -1, -1):
+            index = index * 3 + board.square(row, col) - EMPTY
+    return index
+
+
+def _table_move(board, player, table):
+    '''
+    takes a 3x3 board, the player to move and a loaded solver table
+    returns one of the best moves, or None if the position is not in the table
+    '''
+    index = _table_index(board)
+    best = -2
+    moves = []
+    for row, col in board.get_empty_squares():
+        child = index + (player - EMPTY) * 3 ** (row * 3 + col)
+        stored = table[child * 2 + (provided.switch_player(player) == PLAYERO)]
+        if stored == UNKNOWN:
+            return None
+        if -stored > best:
+            best = -stored
+            moves = []
+        if -stored == best:
+            moves.append((row, col))
+    if len(moves) == 0:
+        return None
+    return random.choice(moves)
+
+
+def _solve_all(board, player, index, values):
+    '''
+    takes a 3x3 board, the player to move, the board's table index and the
+    table being filled
+    stores the exact game value of the position and every position reachable
+    from it, and returns the value of the position
+    '''
+    key = index * 2 + (player == PLAYERO)
+    if values[key] != UNKNOWN:
+        return values[key]
+
+    winner = board.check_win()
+    if winner != None:
+        value = _game_value(winner, player)
+    else:
+        other = provided.switch_player(player)
+        value = -1
+        for row, col in board.get_empty_squares():
+            child = board.clone()
+            child.move(row, col, player)
+            child_index = index + (player - EMPTY) * 3 ** (row * 3 + col)
+            value = max(value, -_solve_all(child, other, child_index, values))
+    values[key] = value
+    return value
+
+
+def build_solver_table(path, reverse = False):
+    '''
+    takes a file path and whether or not the game is reversed
+    solves every 3x3 position reachable from the empty board, with either
+    player starting, and writes the values to path: one header byte for
+    reverse followed by a signed byte per (position, player to move)
+    '''
+    values = array("b", [UNKNOWN]) * (2 * 3 ** 9)
+    for player in (PLAYERX, PLAYERO):
+        _solve_all(TTTBitBoard(3, reverse), player, 0, values)
+    table_file = open(path, "wb")
+    try:
+        array("b", [int(reverse)]).tofile(table_file)
+        values.tofile(table_file)
+    finally:
+        table_file.close()
+
+
+def load_solver_table(path):
+    '''
+    takes the path of a file written by build_solver_table
+    loads it once so that solver_move answers 3x3 positions by lookup
+    '''
+    values = array("b")
+    table_file = open(path, "rb")
+    try:
+        values.fromfile(table_file, 1 + 2 * 3 ** 9)
+    finally:
+        table_file.close()
+    _SOLVER_LOOKUP[bool(values[0])] = values[1:]
+
+
+def solver_move(board, player, trials):
+    '''
+    takes a current board, which player the machine player is
+    ,and the number of trials to run
+    returns a perfect-play move as a (row, column) tuple;
+    3x3 positions are looked up in a table loaded by load_solver_table,
+    otherwise the position is solved by negamax with alpha-beta pruning
+    and a transposition table, trying squares in the order of their
+    Monte Carlo scores after the given number of trials
+    '''
+    empty_squares = board.get_empty_squares()
+    if len(empty_squares) == 0:
+        return
+
+    dim = board.get_dim()
+    reverse = getattr(board, "_reverse", False)
+    if dim == 3 and reverse in _SOLVER_LOOKUP:
+        move = _table_move(board, player, _SOLVER_LOOKUP[reverse])
+        if move != None:
+            return move
+
+    scores = [[0 for dummy_col in range(dim)] for dummy_row in range(dim)]
+    for dummy_trial in range(trials):
+        cloned = board.clone()
+        mc_trial(cloned, player)
+        mc_update_scores(scores, cloned, player)
+    order = sorted(range(dim * dim),
+                   key = lambda index: -scores[index // dim][index % dim])
+
+    other = provided.switch_player(player)
+    best = -2
+    best_move = None
+    for index in order:
+        row, col = divmod(index, dim)
+        if board.square(row, col) != EMPTY:
+            continue
+        child = board.clone()
+        child.move(row, col, player)
+        value = -_negamax(child, other, -2, -best, order)
+        if value > best:
+            best = value
+            best_move = (row, col)
+            if best == 1:
+                break
+    return best_move
+
+
+class MCTSPlayer:
+    """
+    Monte Carlo Tree Search player using UCT selection and mc_trial_fast
+    playouts.
+
+    The tree is stored as parallel arrays indexed by node number, holds at
+    most max_nodes nodes, and is kept between calls so that the subtree
+    below the moves played since the last call is reused.
+
+    Every node also keeps all-moves-as-first (AMAF) statistics, which
+    count a playout for a move whenever either player took that square
+    at any later point, as a win if whoever took it won: like
+    mc_update_scores, a square the opponent won with is worth taking
+    first.  A node
+    gets a child for every empty square on its second visit, so the AMAF
+    statistics of all its moves build up from then on, and the selection
+    value blends them in with RAVE weight sqrt(rave / (3 * visits + rave)):
+    unvisited and young nodes are ranked like flat Monte Carlo scores and
+    older ones by their own results.
+    """
+
+    def __init__(self, max_nodes = MAX_NODES, exploration = EXPLORATION,
+                 rave = RAVE_EQUIVALENCE):
+        """
+        Create a player with an empty tree.
+        """
+        self._max_nodes = max_nodes
+        self._exploration = exploration
+        self._rave = rave
+        self._root_board = None
+        self._root_player = None
+        self._reset()
+
+    def _reset(self):
+        """
+        Drop the tree.
+        """
+        self._parent = array("i")
+        self._move = array("i")
+        self._mover = array("b")
+        self._first_child = array("i")
+        self._next_sibling = array("i")
+        self._visits = array("i")
+        self._wins = array("d")
+        self._amaf_visits = array("i")
+        self._amaf_wins = array("d")
+        self._expanded = array("b")
+
+    def _add_node(self, parent, move, mover):
+        """
+        Append a node for move, played by mover, below parent and
+        return its number.
+        """
+        node = len(self._parent)
+        self._parent.append(parent)
+        self._move.append(move)
+        self._mover.append(mover)
+        self._first_child.append(-1)
+        self._visits.append(0)
+        self._wins.append(0.0)
+        self._amaf_visits.append(0)
+        self._amaf_wins.append(0.0)
+        self._expanded.append(0)
+        if parent >= 0:
+            self._next_sibling.append(self._first_child[parent])
+            self._first_child[parent] = node
+        else:
+            self._next_sibling.append(-1)
+        return node
+
+    def get_num_nodes(self):
+        """
+        Return the number of nodes in the tree.
+        """
+        return len(self._parent)
+
+    def _find_child(self, node, move):
+        """
+        Return the child of node reached by move, or -1.
+        """
+        child = self._first_child[node]
+        while child >= 0 and self._move[child] != move:
+            child = self._next_sibling[child]
+        return child
+
+    def _reroot(self, new_root):
+        """
+        Keep only the subtree below new_root, renumbered from 0.
+        """
+        old_move = self._move
+        old_mover = self._mover
+        old_first = self._first_child
+        old_next = self._next_sibling
+        old_visits = self._visits
+        old_wins = self._wins
+        old_amaf_visits = self._amaf_visits
+        old_amaf_wins = self._amaf_wins
+        old_expanded = self._expanded
+        self._reset()
+
+        stack = [(new_root, -1)]
+        while len(stack) > 0:
+            node, parent = stack.pop()
+            if len(self._parent) >= self._max_nodes:
+                break
+            copy = self._add_node(parent, old_move[node], old_mover[node])
+            self._visits[copy] = old_visits[node]
+            self._wins[copy] = old_wins[node]
+            self._amaf_visits[copy] = old_amaf_visits[node]
+            self._amaf_wins[copy] = old_amaf_wins[node]
+            self._expanded[copy] = old_expanded[node]
+            child = old_first[node]
+            while child >= 0:
+                stack.append((child, copy))
+                child = old_next[child]
+
+    def _advance(self, board, player):
+        """
+        Move the root to the node matching board, if the tree has one.
+        Returns True when the old tree could be reused.
+        """
+        old_board = self._root_board
+        if (old_board == None or len(self._parent) == 0
+                or old_board.get_dim() != board.get_dim()
+                or getattr(old_board, "_reverse", False) != getattr(board, "_reverse", False)):
+            return False
+
+        dim = board.get_dim()
+        played = {}
+        for row in range(dim):
+            for col in range(dim):
+                before = old_board.square(row, col)
+                after = board.square(row, col)
+                if before != after:
+                    if before != EMPTY:
+                        return False
+                    played[row * dim + col] = after
+
+        node = 0
+        mover = self._root_player
+        while len(played) > 0:
+            child = self._first_child[node]
+            while child >= 0 and played.get(self._move[child]) != mover:
+                child = self._next_sibling[child]
+            if child < 0:
+                return False
+            del played[self._move[child]]
+            node = child
+            mover = provided.switch_player(mover)
+
+        if mover != player:
+            return False
+        if node != 0:
+            self._reroot(node)
+        return True
+
+    def _expand(self, node, board, player):
+        """
+        Give node, reached with board and player to move, a child for
+        every empty square unless the game is over or the tree is full.
+        """
+        self._expanded[node] = 1
+        if board.check_win() != None:
+            return
+        empty_squares = board.get_empty_squares()
+        if len(self._parent) + len(empty_squares) > self._max_nodes:
+            return
+        dim = board.get_dim()
+        for row, col in empty_squares:
+            self._add_node(node, row * dim + col, player)
+
+    def _iterate(self, board, player):
+        """
+        Run one select, expand, playout and backpropagate step from the root.
+        """
+        dim = board.get_dim()
+        node = 0
+        board = board.clone()
+
+        # selection, down to the first unvisited node, expanding nodes on
+        # their second visit; unvisited children are ranked by their AMAF
+        # value alone, or tried first if they have none yet
+        while True:
+            if not self._expanded[node] and (node == 0 or self._visits[node] > 0):
+                self._expand(node, board, player)
+            child = self._first_child[node]
+            if child < 0:
+                break
+            log_visits = math.log(self._visits[node] + 1)
+            best = -1.0
+            while child >= 0:
+                visits = self._visits[child]
+                amaf_visits = self._amaf_visits[child]
+                if visits > 0:
+                    value = self._wins[child] / visits
+                    if amaf_visits > 0:
+                        beta = math.sqrt(self._rave / (3.0 * visits + self._rave))
+                        value += beta * (self._amaf_wins[child] / amaf_visits - value)
+                elif amaf_visits > 0:
+                    value = self._amaf_wins[child] / amaf_visits
+                else:
+                    value = 1.0
+                value += self._exploration * math.sqrt(log_visits / (visits + 1))
+                if value > best:
+                    best = value
+                    selected = child
+                child = self._next_sibling[child]
+            node = selected
+            row, col = divmod(self._move[node], dim)
+            board.move(row, col, player)
+            player = provided.switch_player(player)
+            if self._visits[node] == 0:
+                break
+
+        # playout
+        mc_trial_fast(board, player)
+        winner = board.check_win()
+
+        # backpropagation, which also credits the AMAF statistics of every
+        # child whose square its player took later in the game
+        owners = [board.square(index // dim, index % dim) for index in range(dim * dim)]
+        while node >= 0:
+            self._visits[node] += 1
+            if winner == self._mover[node]:
+                self._wins[node] += 1.0
+            elif winner == DRAW:
+                self._wins[node] += 0.5
+            child = self._first_child[node]
+            while child >= 0:
+                owner = owners[self._move[child]]
+                if owner != EMPTY:
+                    self._amaf_visits[child] += 1
+                    if winner == owner:
+                        self._amaf_wins[child] += 1.0
+                    elif winner == DRAW:
+                        self._amaf_wins[child] += 0.5
+                child = self._next_sibling[child]
+            node = self._parent[node]
+
+    def move(self, board, player, iterations = None, time_budget = None):
+        """
+        Search from board, with player to move, for the given number of
+        iterations or seconds, and return the most visited move as a
+        (row, column) tuple.  A time budget also covers reusing the tree
+        from the last call, and the deadline is checked before every
+        iteration, so it is overrun by at most one playout.
+        """
+        if iterations == None and time_budget == None:
+            raise ValueError("give either iterations or time_budget")
+        if time_budget != None:
+            deadline = time.time() + time_budget
+        empty_squares = board.get_empty_squares()
+        if len(empty_squares) == 0:
+            return
+        if len(empty_squares) == 1:
+            return empty_squares[0]
+
+        if not self._advance(board, player):
+            self._reset()
+            self._add_node(-1, -1, provided.switch_player(player))
+        self._root_board = board.clone()
+        self._root_player = player
+
+        if time_budget != None:
+            while time.time() < deadline:
+                self._iterate(board, player)
+        else:
+            for dummy_iteration in range(iterations):
+                self._iterate(board, player)
+
+        dim = board.get_dim()
+        best = -1
+        best_move = empty_squares[0]
+        child = self._first_child[0]
+        while child >= 0:
+            if self._visits[child] > best:
+                best = self._visits[child]
+                best_move = divmod(self._move[child], dim)
+            child = self._next_sibling[child]
+        return best_move
+
+#end of the class MCTSPlayer
+
+MCTS_PLAYER = MCTSPlayer()
+
+
+def mcts_move(board, player, trials):
+    '''
+    takes a current board, which player the machine player is
+    ,and the number of trials to run
+    returns the move chosen by MCTS_PLAYER after trials search iterations
+    '''
+    return MCTS_PLAYER.move(board, player, trials)
+
+
+def mcts_move_timed(board, player, time_budget):
+    '''
+    takes a current board, which player the machine player is
+    ,and a time budget in seconds
+    returns the move chosen by MCTS_PLAYER after searching for time_budget
+    seconds, to be compared with mc_move_timed at equal time
+    '''
+    return MCTS_PLAYER.move(board, player, time_budget = time_budget)
+
+
 # Test game with the console or the GUI.  Uncomment whichever 
 # you prefer.  Both should be commented out when you submit 
 # for testing to save time.
 
-provided.play_game(mc_move, NTRIALS, False)        
-poc_ttt_gui.run_gui(3, provided.PLAYERX, mc_move, NTRIALS, False)
+#provided.play_game(mc_move, NTRIALS, False)        
+#import poc_ttt_gui
+#poc_ttt_gui.run_gui(3, provided.PLAYERX, mc_move, NTRIALS, False)
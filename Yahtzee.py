@@ -3,26 +3,76 @@ Planner for Yahtzee
 Simplifications:  only allow discard and roll, only score against upper level
 """
 
-# Used to increase the timeout, if necessary
-import codeskulptor
-codeskulptor.set_timeout(20)
+import itertools
+import math
+import time
+from array import array
+from collections import OrderedDict
+
+# Used to increase the timeout, if necessary; codeskulptor only exists
+# in CodeSkulptor, and the planner runs offline without it
+try:
+    import codeskulptor
+    codeskulptor.set_timeout(20)
+except ImportError:
+    codeskulptor = None
+
+# mmap and struct are only needed by the strategy table files,
+# build_strategy_table and StrategyTable
+try:
+    import mmap
+    import struct
+except ImportError:
+    mmap = None
+    struct = None
+
+# numpy is only needed by the vectorized scorer, score_batch
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# multiprocessing is only needed by the batch evaluator, strategy_batch
+try:
+    import multiprocessing
+except ImportError:
+    multiprocessing = None
+
+CACHE_SIZE = 100000  # Expected values kept by the hold cache of strategy_cached
+BATCH_SIZE = 1000     # Hands per batch streamed back by strategy_batch
+SCORE_BATCH = 65536   # Sequences scored together by expected_value_batch
+TABLE_MAGIC = b"YSTB" # First bytes of a strategy table file
+if struct != None:
+    TABLE_HEADER = struct.Struct("<4sII")  # magic, die sides, hand size
+    TABLE_RECORD = struct.Struct("<dI")    # expected score, hold mask over the sorted hand
+
+# Scorecard categories beyond the upper section, which is keyed by face
+THREE_OF_A_KIND = "three_of_a_kind"
+FOUR_OF_A_KIND = "four_of_a_kind"
+FULL_HOUSE = "full_house"
+SMALL_STRAIGHT = "small_straight"
+LARGE_STRAIGHT = "large_straight"
+YAHTZEE = "yahtzee"
+CHANCE = "chance"
+LOWER_CATEGORIES = (THREE_OF_A_KIND, FOUR_OF_A_KIND, FULL_HOUSE,
+                    SMALL_STRAIGHT, LARGE_STRAIGHT, YAHTZEE, CHANCE)
+UPPER = "upper"  # Best upper-section category, the same as score
+BEST = "best"    # Best category of the whole scorecard
+
+def iter_all_sequences(outcomes, length):
+    """
+    Generator that lazily yields every sequence of outcomes of given
+    length, as a tuple.  Repeated outcomes give repeated sequences.
+    """
+    return itertools.product(outcomes, repeat = length)
+
 
 def gen_all_sequences(outcomes, length):
     """
     Iterative function that enumerates the set of all sequences of
     outcomes of given length.
     """
-    
-    answer_set = set([()])
-    for dummy_idx in range(length):
-        temp_set = set()
-        for partial_sequence in answer_set:
-            for item in outcomes:
-                new_sequence = list(partial_sequence)
-                new_sequence.append(item)
-                temp_set.add(tuple(new_sequence))
-        answer_set = temp_set
-    return answer_set
+    return set(iter_all_sequences(outcomes, length))
 
 
 def score(hand):
@@ -42,6 +92,57 @@ def score(hand):
         maximum.append(hand.count(item) * item)
     return max(maximum)
 
+def score_batch(hands, num_die_sides):
+    """
+    Compute score for every row of a 2-D array of hands at once, from
+    per-face count histograms built with a single bincount; falls back
+    to calling score on each row when numpy is not available.
+
+    hands: 2-D array of dice, one hand per row
+    num_die_sides: number of sides on each die
+
+    Returns a 1-D array (a list without numpy) of integer scores
+    """
+    if numpy == None:
+        return [score(tuple(hand)) for hand in hands]
+
+    hands = numpy.asarray(hands, dtype = numpy.int64)
+    rows = hands.shape[0]
+    width = num_die_sides + 1
+    offsets = numpy.arange(rows, dtype = numpy.int64)[:, None] * width
+    counts = numpy.bincount((hands + offsets).ravel(), minlength = rows * width)
+    counts = counts.reshape(rows, width)
+    return (counts * numpy.arange(width)).max(axis = 1)
+
+
+def expected_value_batch(held_dice, num_die_sides, num_free_dice, batch_size = SCORE_BATCH):
+    """
+    Compute the same expected value as expected_value, scoring the
+    sequences batch_size at a time with score_batch.  Sequence number i
+    is decoded from the base num_die_sides digits of i, so no batch is
+    ever built from a list of tuples.
+
+    held_dice: dice that you will hold
+    num_die_sides: number of sides on each die
+    num_free_dice: number of dice to be rolled
+
+    Returns a floating point expected value
+    """
+    if numpy == None:
+        return expected_value(held_dice, num_die_sides, num_free_dice)
+
+    num_sequences = num_die_sides ** num_free_dice
+    powers = num_die_sides ** numpy.arange(num_free_dice, dtype = numpy.int64)
+    held = numpy.array(held_dice, dtype = numpy.int64).reshape(1, len(held_dice))
+    total_score = 0
+    for start in range(0, num_sequences, batch_size):
+        index = numpy.arange(start, min(start + batch_size, num_sequences), dtype = numpy.int64)
+        rolled = index[:, None] // powers % num_die_sides + 1
+        hands = numpy.hstack([numpy.repeat(held, len(index), axis = 0), rolled])
+        total_score += int(score_batch(hands, num_die_sides).sum())
+    return float(total_score) / num_sequences
+
+
 def expected_value(held_dice, num_die_sides, num_free_dice):
     """
     Compute the expected value based on held_dice given that there
@@ -53,15 +154,55 @@ def expected_value(held_dice, num_die_sides, num_free_dice):
 
     Returns a floating point expected value
     """
-    scores = []
+    total_score = 0
+    num_sequences = 0
     die_sides_digit = [die for die in range(1, num_die_sides + 1)]
-    all_sequence = gen_all_sequences(die_sides_digit, num_free_dice)
 
     # scoring sum of held dice with each generated possibility
-    for item in all_sequence:
-        scores.append(score(held_dice + item))
+    for item in iter_all_sequences(die_sides_digit, num_free_dice):
+        total_score += score(held_dice + item)
+        num_sequences += 1
     
-    return float(sum(scores)) / len(scores)
+    return float(total_score) / num_sequences
+
+
+def expected_value_multiset(held_dice, num_die_sides, num_free_dice):
+    """
+    Compute the same expected value as expected_value, but over the
+    multisets of rolled dice, each weighted by the number of sequences
+    that produce it, instead of over every sequence.
+
+    held_dice: dice that you will hold
+    num_die_sides: number of sides on each die
+    num_free_dice: number of dice to be rolled
+
+    Returns a floating point expected value
+    """
+    held_counts = [0] * (num_die_sides + 1)
+    for die in held_dice:
+        held_counts[die] += 1
+
+    total_score = 0
+    outcomes = range(1, num_die_sides + 1)
+    for roll, weight in _weighted_rolls(num_die_sides, num_free_dice):
+        counts = held_counts[:]
+        for die in roll:
+            counts[die] += 1
+        total_score += weight * max([face * counts[face] for face in outcomes])
+
+    return float(total_score) / num_die_sides ** num_free_dice
+
+
+def iter_all_holds(hand):
+    """
+    Generator that lazily yields every choice of dice from hand to hold,
+    one per subset of positions, keeping the order of hand.  Repeated
+    dice give repeated holds.
+
+    hand: full yahtzee hand
+    """
+    for mask in range(1 << len(hand)):
+        yield tuple([die for idx, die in enumerate(hand) if mask >> idx & 1])
 
 
 def gen_all_holds(hand):
@@ -72,12 +213,7 @@ def gen_all_holds(hand):
 
     Returns a set of tuples, where each tuple is dice to hold
     """
-    from_hand=[()]
-    for item in hand:
-        for sub in from_hand:
-            from_hand = from_hand + [tuple(sub)+(item,)]
-
-    return set(from_hand)
+    return set(iter_all_holds(hand))
 
 
 
@@ -96,7 +232,7 @@ def strategy(hand, num_die_sides):
     current_value = float('-inf')
     
     for item in gen_all_holds(hand):
-        value = expected_value(item, num_die_sides,len(hand)-len(item))
+        value = expected_value_multiset(item, num_die_sides,len(hand)-len(item))
         if value>current_value:
             current_value=value
             result=(current_value,item)
@@ -104,6 +240,591 @@ def strategy(hand, num_die_sides):
     return result
 
 
+class HoldCache:
+    """
+    Bounded LRU cache of hold expected values.
+
+    Entries are keyed on the sorted held dice, the number of die sides
+    and the number of free dice, so holds that are the same multiset
+    share one entry whichever hand they came from.
+    """
+
+    def __init__(self, capacity = CACHE_SIZE):
+        """
+        Create an empty cache holding at most capacity expected values.
+        """
+        self._capacity = capacity
+        self._entries = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __len__(self):
+        """
+        Return the number of cached expected values.
+        """
+        return len(self._entries)
+
+    def lookup(self, key):
+        """
+        Return the expected value stored for key, or None.
+        """
+        value = self._entries.pop(key, None)
+        if value == None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        self._entries[key] = value
+        return value
+
+    def store(self, key, value):
+        """
+        Record value for key, evicting the least recently used entries
+        if the cache is full.
+        """
+        self._entries.pop(key, None)
+        self._entries[key] = value
+        while len(self._entries) > self._capacity:
+            self._entries.popitem(last = False)
+            self._evictions += 1
+
+    def clear(self):
+        """
+        Drop every entry and reset the counters.
+        """
+        self._entries.clear()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get_stats(self):
+        """
+        Return a dictionary with the hit, miss and eviction counters and
+        the hit rate.
+        """
+        lookups = self._hits + self._misses
+        hit_rate = 0.0
+        if lookups > 0:
+            hit_rate = float(self._hits) / lookups
+        return {"hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": hit_rate,
+                "size": len(self._entries),
+                "capacity": self._capacity}
+
+EV_CACHE = HoldCache()
+
+
+def expected_value_cached(held_dice, num_die_sides, num_free_dice, cache = EV_CACHE):
+    """
+    Compute the same expected value as expected_value_multiset, looking
+    it up in cache first and storing it there on a miss.
+
+    held_dice: dice that you will hold, in any order
+    num_die_sides: number of sides on each die
+    num_free_dice: number of dice to be rolled
+    cache: HoldCache shared between calls
+
+    Returns a floating point expected value
+    """
+    key = (tuple(sorted(held_dice)), num_die_sides, num_free_dice)
+    value = cache.lookup(key)
+    if value == None:
+        value = expected_value_multiset(key[0], num_die_sides, num_free_dice)
+        cache.store(key, value)
+    return value
+
+
+def strategy_cached(hand, num_die_sides, cache = EV_CACHE):
+    """
+    Compute the same best hold as strategy, evaluating each distinct
+    multiset of held dice once and reusing the expected values kept in
+    cache by earlier calls.
+
+    hand: full yahtzee hand
+    num_die_sides: number of sides on each die
+    cache: HoldCache shared between calls
+
+    Returns a tuple where the first element is the expected score and
+    the second element is a sorted tuple of the dice to hold
+    """
+    result = (0.0, ())
+    current_value = float('-inf')
+
+    holds = set([tuple(sorted(item)) for item in gen_all_holds(hand)])
+    for item in sorted(holds):
+        value = expected_value_cached(item, num_die_sides, len(hand) - len(item), cache)
+        if value > current_value:
+            current_value = value
+            result = (current_value, item)
+
+    return result
+
+
+def _choose(total, count):
+    """
+    Return the binomial coefficient total choose count, 0 if count > total.
+    """
+    if count < 0 or count > total:
+        return 0
+    result = 1
+    for idx in range(count):
+        result = result * (total - idx) // (idx + 1)
+    return result
+
+
+# binomial tables shared by hand_rank and ScoreTable, by hand size
+_BINOMIALS = {}
+
+
+def _binomial_table(num_die_sides, hand_size):
+    """
+    Return a table whose row idx holds value choose idx + 1 for every
+    value below num_die_sides + hand_size, as needed to rank hands of
+    hand_size dice with num_die_sides sides.  The table is built once per
+    hand size and only rebuilt when a higher die is seen.
+    """
+    table = _BINOMIALS.get(hand_size)
+    if table == None or (hand_size > 0 and len(table[0]) < num_die_sides + hand_size):
+        table = [[_choose(value, idx + 1) for value in range(num_die_sides + hand_size)]
+                 for idx in range(hand_size)]
+        _BINOMIALS[hand_size] = table
+    return table
+
+
+def num_hands(num_die_sides, hand_size):
+    """
+    Return the number of sorted hands of hand_size dice with num_die_sides
+    sides each.
+    """
+    return _choose(num_die_sides + hand_size - 1, hand_size)
+
+
+def hand_rank(hand):
+    """
+    Return the position of a hand among all sorted hands of the same size,
+    counting from 0.  Sorted dice d_0 <= d_1 <= ... map to the strictly
+    increasing values d_i - 1 + i, which are ranked in the combinatorial
+    number system, with the binomials read from _binomial_table.
+    """
+    ordered = sorted(hand)
+    if len(ordered) == 0:
+        return 0
+    binomials = _binomial_table(ordered[-1], len(ordered))
+    rank = 0
+    for idx in range(len(ordered)):
+        rank += binomials[idx][ordered[idx] - 1 + idx]
+    return rank
+
+
+def build_strategy_table(path, num_die_sides, hand_size, cache = EV_CACHE):
+    """
+    Evaluate strategy_cached for every sorted hand of hand_size dice and
+    write the answers to path: a TABLE_HEADER followed by one TABLE_RECORD
+    per hand, in hand_rank order.  Bit i of a record's hold mask is set
+    when die i of the sorted hand is held.
+    """
+    count = num_hands(num_die_sides, hand_size)
+    data = bytearray(TABLE_HEADER.size + count * TABLE_RECORD.size)
+    TABLE_HEADER.pack_into(data, 0, TABLE_MAGIC, num_die_sides, hand_size)
+    outcomes = range(1, num_die_sides + 1)
+    for hand in itertools.combinations_with_replacement(outcomes, hand_size):
+        hand_score, hold = strategy_cached(hand, num_die_sides, cache)
+        mask = 0
+        held = list(hold)
+        for idx, die in enumerate(hand):
+            if die in held:
+                held.remove(die)
+                mask |= 1 << idx
+        offset = TABLE_HEADER.size + hand_rank(hand) * TABLE_RECORD.size
+        TABLE_RECORD.pack_into(data, offset, hand_score, mask)
+    table_file = open(path, "wb")
+    try:
+        table_file.write(data)
+    finally:
+        table_file.close()
+
+
+class StrategyTable:
+    """
+    Read-only view of a file written by build_strategy_table.
+
+    The file is memory-mapped, so opening it costs the same whatever its
+    size and each query reads a single record.
+    """
+
+    def __init__(self, path):
+        """
+        Map the table stored at path.
+        """
+        table_file = open(path, "rb")
+        try:
+            self._data = mmap.mmap(table_file.fileno(), 0, access = mmap.ACCESS_READ)
+        finally:
+            table_file.close()
+        magic, self._num_die_sides, self._hand_size = TABLE_HEADER.unpack_from(self._data, 0)
+        if magic != TABLE_MAGIC:
+            self._data.close()
+            raise ValueError(path + " is not a strategy table")
+
+    def get_num_die_sides(self):
+        """
+        Return the number of sides on each die.
+        """
+        return self._num_die_sides
+
+    def get_hand_size(self):
+        """
+        Return the number of dice in a hand.
+        """
+        return self._hand_size
+
+    def strategy(self, hand):
+        """
+        Return the stored (expected score, sorted tuple of dice to hold)
+        answer for hand, given in any order.
+        """
+        if len(hand) != self._hand_size:
+            raise ValueError("table holds hands of " + str(self._hand_size) + " dice")
+        ordered = sorted(hand)
+        offset = TABLE_HEADER.size + hand_rank(ordered) * TABLE_RECORD.size
+        hand_score, mask = TABLE_RECORD.unpack_from(self._data, offset)
+        hold = tuple([die for idx, die in enumerate(ordered) if mask >> idx & 1])
+        return (hand_score, hold)
+
+    def close(self):
+        """
+        Unmap the file.
+        """
+        self._data.close()
+
+#end of the class StrategyTable
+
+
+def _sub_multisets(hand):
+    """
+    Return every sorted sub-multiset of a sorted hand, in sorted order.
+    """
+    runs = [(die, len(list(group))) for die, group in itertools.groupby(hand)]
+    choices = [[(die,) * count for count in range(total + 1)] for die, total in runs]
+    return sorted([sum(parts, ()) for parts in itertools.product(*choices)])
+
+
+# weighted rolls already computed, keyed by (num_die_sides, num_free_dice)
+_WEIGHTED_ROLLS = {}
+
+def _weighted_rolls(num_die_sides, num_free_dice):
+    """
+    Return a list of (sorted roll, weight) pairs covering every multiset
+    of num_free_dice rolled dice, where weight is the number of sequences
+    that produce the roll.  The list is built once per key and shared,
+    so callers must not modify it.
+    """
+    key = (num_die_sides, num_free_dice)
+    if key not in _WEIGHTED_ROLLS:
+        result = []
+        outcomes = range(1, num_die_sides + 1)
+        for roll in itertools.combinations_with_replacement(outcomes, num_free_dice):
+            weight = math.factorial(num_free_dice)
+            for dummy_die, group in itertools.groupby(roll):
+                weight //= math.factorial(len(list(group)))
+            result.append((roll, weight))
+        _WEIGHTED_ROLLS[key] = result
+    return _WEIGHTED_ROLLS[key]
+
+
+# reroll plans already computed, keyed by (num_die_sides, hand_size)
+_REROLL_PLANS = {}
+
+def plan_rerolls(num_die_sides, hand_size, rerolls):
+    """
+    Compute optimal hold policies for up to rerolls rerolls by dynamic
+    programming over sorted hands.  With no rerolls left a hand is worth
+    its score; with k left it is worth the best expected value, over its
+    holds, of the hand reached by rolling the other dice with k - 1 left.
+    The hold-to-hand transition table is built once and shared by every
+    layer, so each layer costs one pass over the hold multisets.
+
+    num_die_sides: number of sides on each die
+    hand_size: number of dice in a hand
+    rerolls: number of rerolls to plan for
+
+    Returns a list of dictionaries, where layer k maps every sorted hand
+    to the (expected score, sorted hold) pair with k rerolls left
+    """
+    key = (num_die_sides, hand_size)
+    if key not in _REROLL_PLANS:
+        outcomes = range(1, num_die_sides + 1)
+        hands = list(itertools.combinations_with_replacement(outcomes, hand_size))
+        hand_holds = dict([(hand, _sub_multisets(hand)) for hand in hands])
+        rolls = [_weighted_rolls(num_die_sides, free) for free in range(hand_size + 1)]
+        transitions = {}
+        for holds in hand_holds.values():
+            for hold in holds:
+                if hold not in transitions:
+                    transitions[hold] = [(tuple(sorted(hold + roll)), weight)
+                                         for roll, weight in rolls[hand_size - len(hold)]]
+        first_layer = dict([(hand, (score(hand), hand)) for hand in hands])
+        _REROLL_PLANS[key] = (hand_holds, transitions, [first_layer])
+
+    hand_holds, transitions, layers = _REROLL_PLANS[key]
+    while len(layers) <= rerolls:
+        previous = layers[-1]
+        hold_values = {}
+        for hold, targets in transitions.items():
+            total = sum([weight * previous[hand][0] for hand, weight in targets])
+            hold_values[hold] = float(total) / num_die_sides ** (hand_size - len(hold))
+        layer = {}
+        for hand, holds in hand_holds.items():
+            best = (float('-inf'), ())
+            for hold in holds:
+                if hold_values[hold] > best[0]:
+                    best = (hold_values[hold], hold)
+            layer[hand] = best
+        layers.append(layer)
+    return layers[:rerolls + 1]
+
+
+def strategy_rerolls(hand, num_die_sides, rerolls = 2):
+    """
+    Compute the hold that maximizes the expected score when up to rerolls
+    rerolls remain, each played optimally.  With one reroll this is the
+    same answer as strategy.
+
+    hand: full yahtzee hand
+    num_die_sides: number of sides on each die
+    rerolls: number of rerolls left
+
+    Returns a tuple where the first element is the expected score and
+    the second element is a sorted tuple of the dice to hold
+    """
+    layers = plan_rerolls(num_die_sides, len(hand), rerolls)
+    return layers[rerolls][tuple(sorted(hand))]
+
+
+def _strategy_task(task):
+    """
+    Evaluate a (sorted hand, num_die_sides) work unit with strategy_cached
+    on the cache of this process.
+
+    Returns (result, cache hits, cache misses) for the call
+    """
+    hand, num_die_sides = task
+    before = EV_CACHE.get_stats()
+    result = strategy_cached(hand, num_die_sides)
+    after = EV_CACHE.get_stats()
+    return (result, after["hits"] - before["hits"], after["misses"] - before["misses"])
+
+
+def strategy_batch(hands, num_die_sides, workers = None, batch_size = BATCH_SIZE, pool = None):
+    """
+    Evaluate strategy_cached for an iterable of hands, in batches of
+    batch_size.  The hands of a batch are deduplicated by sorted multiset
+    and the distinct ones are evaluated on a pool of worker processes,
+    each keeping its own hold cache across batches.
+
+    hands: iterable of full yahtzee hands
+    num_die_sides: number of sides on each die
+    workers: number of processes (defaults to the cpu count), 1 runs in this process
+    batch_size: number of hands per batch
+    pool: an existing multiprocessing.Pool to reuse across calls
+
+    Yields one (results, stats) pair per batch, where results lists the
+    (expected score, hold) answers in input order and stats is a
+    dictionary with the hand counts, the wall-clock seconds and the hold
+    cache hits and misses of the batch
+    """
+    own_pool = None
+    if pool == None and workers != 1 and multiprocessing != None:
+        own_pool = multiprocessing.Pool(workers)
+        pool = own_pool
+
+    try:
+        hands = iter(hands)
+        while True:
+            batch = [tuple(sorted(hand)) for hand in itertools.islice(hands, batch_size)]
+            if len(batch) == 0:
+                break
+            start = time.time()
+            distinct = sorted(set(batch))
+            tasks = [(hand, num_die_sides) for hand in distinct]
+            if pool != None:
+                answers = pool.map(_strategy_task, tasks)
+            else:
+                answers = [_strategy_task(task) for task in tasks]
+
+            by_hand = dict(zip(distinct, [answer[0] for answer in answers]))
+            hits = sum([answer[1] for answer in answers])
+            misses = sum([answer[2] for answer in answers])
+            lookups = hits + misses
+            stats = {"hands": len(batch),
+                     "distinct": len(distinct),
+                     "seconds": time.time() - start,
+                     "hits": hits,
+                     "misses": misses,
+                     "hit_rate": float(hits) / lookups if lookups else 0.0}
+            yield ([by_hand[hand] for hand in batch], stats)
+    finally:
+        if own_pool != None:
+            own_pool.close()
+            own_pool.join()
+
+
+def score_categories(hand, num_die_sides):
+    """
+    Score a hand in every scorecard category.  Upper-section categories
+    are keyed by face and score face * count; the lower section uses the
+    usual Yahtzee rules, with straights of 4 and 5 consecutive faces.
+
+    hand: full yahtzee hand
+    num_die_sides: number of sides on each die
+
+    Returns a dictionary from category to integer score
+    """
+    counts = [0] * (num_die_sides + 2)
+    for die in hand:
+        counts[die] += 1
+    total = sum(hand)
+    most = max(counts)
+
+    longest = 0
+    run = 0
+    for face in range(1, num_die_sides + 1):
+        if counts[face] > 0:
+            run += 1
+            longest = max(longest, run)
+        else:
+            run = 0
+
+    scores = {}
+    for face in range(1, num_die_sides + 1):
+        scores[face] = face * counts[face]
+    scores[THREE_OF_A_KIND] = total if most >= 3 else 0
+    scores[FOUR_OF_A_KIND] = total if most >= 4 else 0
+    scores[FULL_HOUSE] = 25 if 3 in counts and 2 in counts else 0
+    scores[SMALL_STRAIGHT] = 30 if longest >= 4 else 0
+    scores[LARGE_STRAIGHT] = 40 if longest >= 5 else 0
+    scores[YAHTZEE] = 50 if len(hand) > 0 and most == len(hand) else 0
+    scores[CHANCE] = total
+    scores[UPPER] = max([scores[face] for face in range(1, num_die_sides + 1)])
+    scores[BEST] = max(scores.values())
+    return scores
+
+
+class ScoreTable:
+    """
+    Scores of every sorted hand in every scorecard category.
+
+    Each category is a column array indexed by hand_rank, and the ranks
+    are computed from the shared table of binomial coefficients, so
+    scoring a hand costs one pass over its dice and one array lookup.
+    """
+
+    def __init__(self, num_die_sides, hand_size):
+        """
+        Score every sorted hand of hand_size dice with num_die_sides sides.
+        """
+        self._num_die_sides = num_die_sides
+        self._hand_size = hand_size
+        self._binomials = _binomial_table(num_die_sides, hand_size)
+        self._columns = {}
+        outcomes = range(1, num_die_sides + 1)
+        for hand in itertools.combinations_with_replacement(outcomes, hand_size):
+            row = self.rank(hand)
+            for category, value in score_categories(hand, num_die_sides).items():
+                if category not in self._columns:
+                    self._columns[category] = array("i", [0]) * num_hands(num_die_sides, hand_size)
+                self._columns[category][row] = value
+
+    def get_categories(self):
+        """
+        Return a list of the categories the table can score.
+        """
+        return list(self._columns.keys())
+
+    def rank(self, hand):
+        """
+        Return hand_rank of a sorted hand.
+        """
+        rank = 0
+        for idx in range(len(hand)):
+            rank += self._binomials[idx][hand[idx] - 1 + idx]
+        return rank
+
+    def score(self, hand, categories = (BEST,)):
+        """
+        Return the best score of a sorted hand over the given categories.
+        """
+        row = self.rank(hand)
+        if len(categories) == 1:
+            return self._columns[categories[0]][row]
+        return max([self._columns[category][row] for category in categories])
+
+#end of the class ScoreTable
+
+
+# score tables already built, keyed by (num_die_sides, hand_size)
+_SCORE_TABLES = {}
+
+def get_score_table(num_die_sides, hand_size):
+    """
+    Return the ScoreTable for hands of hand_size dice with num_die_sides
+    sides, building it on first use.
+    """
+    key = (num_die_sides, hand_size)
+    if key not in _SCORE_TABLES:
+        _SCORE_TABLES[key] = ScoreTable(num_die_sides, hand_size)
+    return _SCORE_TABLES[key]
+
+
+def expected_value_category(held_dice, num_die_sides, num_free_dice, categories = (BEST,)):
+    """
+    Compute the expected value based on held_dice, as
+    expected_value_multiset does, of the best score over the given
+    scorecard categories.
+
+    held_dice: dice that you will hold
+    num_die_sides: number of sides on each die
+    num_free_dice: number of dice to be rolled
+    categories: categories the hand may be scored in
+
+    Returns a floating point expected value
+    """
+    table = get_score_table(num_die_sides, len(held_dice) + num_free_dice)
+    total_score = 0
+    for roll, weight in _weighted_rolls(num_die_sides, num_free_dice):
+        total_score += weight * table.score(tuple(sorted(held_dice + roll)), categories)
+    return float(total_score) / num_die_sides ** num_free_dice
+
+
+def strategy_category(hand, num_die_sides, categories = (BEST,)):
+    """
+    Compute the hold that maximizes the expected value, over the given
+    scorecard categories, when the discarded dice are rolled.  With
+    categories (UPPER,) this is the same answer as strategy.
+
+    hand: full yahtzee hand
+    num_die_sides: number of sides on each die
+    categories: categories the hand may be scored in, a single category
+    to target one or the open categories of a scorecard
+
+    Returns a tuple where the first element is the expected score and
+    the second element is a sorted tuple of the dice to hold
+    """
+    result = (0.0, ())
+    current_value = float('-inf')
+
+    holds = set([tuple(sorted(item)) for item in gen_all_holds(hand)])
+    for item in sorted(holds):
+        value = expected_value_category(item, num_die_sides, len(hand) - len(item), categories)
+        if value > current_value:
+            current_value = value
+            result = (current_value, item)
+
+    return result
+
+
 def run_example():
     """
     Compute the dice to hold and expected score for an example hand
@@ -0,0 +1,194 @@
+"""
+Headless strategy sweeps for the Cookie Clicker simulator.
+
+Every combination of strategy, duration and BuildInfo variant is
+simulated on a pool of worker processes with simulate_clicker_fast, and
+the final state of each run is streamed to a CSV or JSON lines results
+file as it arrives.  Strategies are either strategy functions of
+cookieClicker or parameterized versions of strategy_best, so a grid of
+weights and look-ahead depths can be searched in one sweep.
+
+Example:
+    python clicker_sweep.py --strategy strategy_cheap --strategy strategy_best
+        --grid 0.8,1.0,1.2:0,1,2 --duration 1e10 --growth 1.15
+        --growth 1.1 --out results.csv
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import sys
+import time
+
+import cookieClicker as clicker
+
+BEST = "best"   # Name of the parameterized strategy_best
+FIELDS = ["strategy", "weight", "lookahead", "duration", "variant",
+          "total", "cookies", "cps", "time", "purchases", "seconds"]
+
+
+def parse_strategy(text):
+    """
+    Turn "strategy_name" or "best:weight:lookahead" into a strategy
+    tuple (name, weight, lookahead).
+    """
+    fields = text.split(":")
+    if fields[0] == BEST:
+        if len(fields) != 3:
+            raise ValueError("parameterized strategy should be best:weight:lookahead, got " + text)
+        return (BEST, float(fields[1]), int(fields[2]))
+    if len(fields) != 1 or not callable(getattr(clicker, fields[0], None)):
+        raise ValueError("no strategy function named " + text)
+    return (fields[0], None, None)
+
+
+def grid_strategies(weights, lookaheads):
+    """
+    Return the strategy tuples of every (weight, lookahead) pair.
+    """
+    return [(BEST, weight, lookahead)
+            for weight, lookahead in itertools.product(weights, lookaheads)]
+
+
+def build_strategy(spec):
+    """
+    Return the strategy function of a strategy tuple.
+    """
+    name, weight, lookahead = spec
+    if name == BEST:
+        return clicker.make_strategy_best(weight, lookahead)
+    return getattr(clicker, name)
+
+
+def build_info(variant):
+    """
+    Return a fresh BuildInfo for a variant dictionary with a "growth"
+    factor and optionally an "items" map from name to [cost, cps].
+    """
+    return clicker.provided.BuildInfo(variant.get("items"), variant["growth"])
+
+
+def run_scenario(task):
+    """
+    Simulate a (strategy tuple, duration, variant) scenario and return
+    its result dictionary, with the FIELDS keys.
+    """
+    spec, duration, variant = task
+    start = time.time()
+    state = clicker.simulate_clicker_fast(build_info(variant), duration,
+                                          build_strategy(spec))
+    history = state.get_history()
+    return {"strategy": spec[0],
+            "weight": spec[1],
+            "lookahead": spec[2],
+            "duration": duration,
+            "variant": variant["name"],
+            "total": state.get_total(),
+            "cookies": state.get_cookies(),
+            "cps": state.get_cps(),
+            "time": state.get_time(),
+            "purchases": (len(history) - 1) * history.get_stride(),
+            "seconds": time.time() - start}
+
+
+def _open_writer(path):
+    """
+    Open a results file and return (file, write function).  Paths
+    ending in .csv get a CSV header and rows, others one JSON object
+    per line.
+    """
+    out = open(path, "w")
+    if path.endswith(".csv"):
+        writer = csv.DictWriter(out, FIELDS)
+        writer.writeheader()
+        return out, writer.writerow
+    return out, lambda result: out.write(json.dumps(result, sort_keys = True) + "\n")
+
+
+def run_sweep(strategies, durations, variants, workers = None, out_path = None):
+    """
+    Simulate every (strategy, duration, variant) combination on a pool of
+    workers (all cores by default, 1 runs in this process), write each
+    result to out_path as it arrives, and return the list of results in
+    scenario order.
+    """
+    tasks = list(itertools.product(strategies, durations, variants))
+
+    out = None
+    if out_path != None:
+        out, write = _open_writer(out_path)
+
+    pool = None
+    if workers == 1:
+        results = (run_scenario(task) for task in tasks)
+    else:
+        pool = multiprocessing.Pool(workers)
+        results = pool.imap(run_scenario, tasks)
+
+    collected = []
+    try:
+        for result in results:
+            collected.append(result)
+            if out != None:
+                write(result)
+                out.flush()
+    finally:
+        if pool != None:
+            pool.close()
+            pool.join()
+        if out != None:
+            out.close()
+    return collected
+
+
+def best_results(results):
+    """
+    Return a dictionary from (duration, variant) to the result with the
+    highest total cookies.
+    """
+    best = {}
+    for result in results:
+        key = (result["duration"], result["variant"])
+        if key not in best or result["total"] > best[key]["total"]:
+            best[key] = result
+    return best
+
+
+def main(argv = None):
+    """
+    Parse the command line, run the sweep and print the best strategy of
+    every (duration, variant) pair as JSON.
+    """
+    parser = argparse.ArgumentParser(description = "Cookie Clicker strategy sweep.")
+    parser.add_argument("--strategy", action = "append", default = [],
+                        help = "strategy_name or best:weight:lookahead")
+    parser.add_argument("--grid", action = "append", default = [],
+                        help = "weights:lookaheads, comma separated lists searched as best strategies")
+    parser.add_argument("--duration", action = "append", type = float,
+                        help = "simulated seconds, defaults to SIM_TIME")
+    parser.add_argument("--growth", action = "append", type = float,
+                        help = "cost growth factor of a BuildInfo variant, defaults to 1.15")
+    parser.add_argument("--workers", type = int)
+    parser.add_argument("--out", help = "results file, .csv or JSON lines")
+    args = parser.parse_args(argv)
+
+    strategies = [parse_strategy(text) for text in args.strategy]
+    for text in args.grid:
+        weights, lookaheads = text.split(":")
+        strategies.extend(grid_strategies([float(value) for value in weights.split(",")],
+                                          [int(value) for value in lookaheads.split(",")]))
+    if len(strategies) == 0:
+        parser.error("give at least one --strategy or --grid")
+    durations = args.duration or [clicker.SIM_TIME]
+    variants = [{"name": "growth=" + str(growth), "growth": growth}
+                for growth in args.growth or [1.15]]
+
+    results = run_sweep(strategies, durations, variants, args.workers, args.out)
+    best = [dict(result) for result in best_results(results).values()]
+    sys.stdout.write(json.dumps(best, indent = 2, sort_keys = True) + "\n")
+
+
+if __name__ == "__main__":
+    main()
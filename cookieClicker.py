@@ -2,30 +2,201 @@
 Cookie Clicker Simulator
 """
 
-import simpleplot
 import math
+import heapq
+import time as timer
+from array import array
+
+# simpleplot and codeskulptor only exist in CodeSkulptor; without them
+# the simulator still runs headless, as clicker_sweep does
+try:
+    import simpleplot
+except ImportError:
+    simpleplot = None
 
 # Used to increase the timeout, if necessary
-import codeskulptor
-codeskulptor.set_timeout(20)
+try:
+    import codeskulptor
+    codeskulptor.set_timeout(20)
+except ImportError:
+    codeskulptor = None
 
 import poc_clicker_provided as provided
 
 # Constants
 SIM_TIME = 10000000000.0
+PLOT_POINTS = 1000  # Points per line drawn by run_strategy
+PLAN_DEPTH = 1      # Purchases searched exhaustively by strategy_planner
+PLAN_BUDGET = 0.02  # Seconds of planning per purchase of strategy_planner
+
+class ClickerHistory:
+    """
+    Columnar store of purchase history.
+
+    The times, costs and total cookies are kept in parallel array('d')
+    columns and the item names are interned as small ints, so a purchase
+    costs 26 bytes instead of a tuple.  With max_rows set, the store
+    decimates itself whenever it grows past max_rows: it drops every
+    other row and from then on only keeps every stride-th purchase, so
+    memory stays bounded however long the simulation runs.
+    """
+
+    def __init__(self, max_rows = None):
+        """
+        Create a history holding the initial (0.0, None, 0.0, 0.0) entry.
+        """
+        self._times = array("d")
+        self._items = array("H")
+        self._costs = array("d")
+        self._totals = array("d")
+        self._names = []
+        self._codes = {}
+        self._max_rows = max_rows
+        self._stride = 1
+        self._count = 0
+        self.append(0.0, None, 0.0, 0.0)
+
+    def append(self, time, item_name, cost, total):
+        """
+        Record a purchase, unless decimation skips it: only every
+        stride-th purchase is stored.
+        """
+        self._count += 1
+        if (self._count - 1) % self._stride != 0:
+            return
+
+        if item_name not in self._codes:
+            self._codes[item_name] = len(self._names)
+            self._names.append(item_name)
+        self._times.append(time)
+        self._items.append(self._codes[item_name])
+        self._costs.append(cost)
+        self._totals.append(total)
+
+        if self._max_rows != None and len(self._times) > self._max_rows:
+            self._times = self._times[::2]
+            self._items = self._items[::2]
+            self._costs = self._costs[::2]
+            self._totals = self._totals[::2]
+            self._stride *= 2
+
+    def get_stride(self):
+        """
+        Return the number of purchases each stored row stands for.
+        """
+        return self._stride
+
+    def __len__(self):
+        """
+        Return the number of stored rows.
+        """
+        return len(self._times)
+
+    def __getitem__(self, index):
+        """
+        Return row index as a (time, item, cost of item, total cookies)
+        tuple, or a list of them for a slice.
+        """
+        if isinstance(index, slice):
+            return [self[row] for row in range(*index.indices(len(self._times)))]
+        return (self._times[index], self._names[self._items[index]],
+                self._costs[index], self._totals[index])
+
+    def __iter__(self):
+        """
+        Iterate over the stored rows as tuples.
+        """
+        for row in range(len(self._times)):
+            yield self[row]
+
+    def plot_points(self, max_points = None):
+        """
+        Return a list of (time, total cookies) points for plotting, taking
+        every k-th row so that at most max_points are returned (plus the
+        last row, which is always included).
+        """
+        step = 1
+        if max_points != None and len(self._times) > max_points:
+            step = int(math.ceil(len(self._times) / float(max_points)))
+        rows = range(0, len(self._times), step)
+        points = [(self._times[row], self._totals[row]) for row in rows]
+        if len(self._times) > 0 and rows[-1] != len(self._times) - 1:
+            points.append((self._times[-1], self._totals[-1]))
+        return points
+
+#end of the class ClickerHistory
+
+
+class HistoryView:
+    """
+    Read-only view of a ClickerHistory, as handed to strategies.
+    """
+
+    def __init__(self, history):
+        """
+        Wrap history without copying it.
+        """
+        self._history = history
+
+    def __len__(self):
+        """
+        Return the number of stored rows.
+        """
+        return len(self._history)
+
+    def __getitem__(self, index):
+        """
+        Return a row, or a list of rows for a slice.
+        """
+        return self._history[index]
+
+    def __iter__(self):
+        """
+        Iterate over the rows as (time, item, cost of item, total cookies).
+        """
+        return iter(self._history)
+
+    def get_stride(self):
+        """
+        Return the number of purchases each row stands for.
+        """
+        return self._history.get_stride()
+
+    def plot_points(self, max_points = None):
+        """
+        Return at most max_points (time, total cookies) points, see
+        ClickerHistory.plot_points.
+        """
+        return self._history.plot_points(max_points)
+
+#end of the class HistoryView
+
+
+def _wait_time(cookies, cps, cost):
+    """
+    Return the time until cookies reach cost, at cps cookies per second
+    (could be 0.0), rounded up to whole seconds as in time_until.
+    """
+    if cookies >= cost:
+        return 0.0
+    elif cps != 0:
+        return math.ceil((cost - cookies) / cps)
+    else:
+        return float('inf')
+
 
 class ClickerState:
     """
     Simple class to keep track of the game state.
     """
     
-    def __init__(self):
+    def __init__(self, max_history = None):
         self._total_num_of_cookies = 0.0
         self._current_num_of_cookies = 0.0
         self._current_time = 0.0
         self._current_cps = 1.0
         
-        self._history = [(0.0, None, 0.0, 0.0)]
+        self._history = ClickerHistory(max_history)
         
         
     def __str__(self):
@@ -46,6 +217,14 @@ class ClickerState:
         """
         return self._current_num_of_cookies
     
+    def get_total(self):
+        """
+        Return total number of cookies produced so far
+
+        Should return a float
+        """
+        return self._total_num_of_cookies
+    
     def get_cps(self):
         """
         Get current CPS
@@ -73,8 +252,10 @@ class ClickerState:
 
         Should return a copy of any internal data structures,
         so that they will not be modified outside of the class.
+        Returns a read-only HistoryView of the columnar history,
+        which indexes and iterates like that list.
         """
-        return self._history
+        return HistoryView(self._history)
 
     def time_until(self, cookies):
         """
@@ -83,12 +264,7 @@ class ClickerState:
 
         Should return a float with no fractional part
         """
-        if self._current_num_of_cookies >= cookies:
-            return 0.0
-        elif self._current_cps!=0:
-            return math.ceil( (cookies-self._current_num_of_cookies)/self._current_cps  )
-        else:
-            return float('inf')
+        return _wait_time(self._current_num_of_cookies, self._current_cps, cookies)
     
     def wait(self, time):
         """
@@ -115,8 +291,119 @@ class ClickerState:
         else:
             self._current_num_of_cookies -= cost
             self._current_cps += additional_cps
-            self._history.append( (self._current_time, item_name, cost, self._total_num_of_cookies) )
+            self._history.append(self._current_time, item_name, cost, self._total_num_of_cookies)
             
+class IndexedBuildInfo:
+    """
+    Wrapper around a BuildInfo that keeps its items in heaps keyed by
+    cost and by efficiency (cps / cost), so that the cheapest, most
+    expensive and most efficient items are found in O(log n).
+
+    update_item pushes fresh entries for the updated item and bumps its
+    version; stale entries are dropped lazily when they reach the top of
+    a heap.  Ties are broken by item name.
+    """
+
+    def __init__(self, build_info):
+        """
+        Index a copy of build_info.
+        """
+        self._build_info = build_info.clone()
+        self._versions = {}
+        self._rebuild()
+
+    def _rebuild(self):
+        """
+        Rebuild the heaps from the current costs, without stale entries.
+        """
+        self._by_cost = []
+        self._by_cost_desc = []
+        self._by_efficiency = []
+        for item in self._build_info.build_items():
+            self._versions[item] = self._versions.get(item, 0) + 1
+            self._push(item)
+        heapq.heapify(self._by_cost)
+        heapq.heapify(self._by_cost_desc)
+        heapq.heapify(self._by_efficiency)
+
+    def _push(self, item):
+        """
+        Add entries for the current cost of item to the three heaps.
+        """
+        cost = self._build_info.get_cost(item)
+        version = self._versions[item]
+        efficiency = float(self._build_info.get_cps(item)) / float(cost)
+        heapq.heappush(self._by_cost, (cost, item, version))
+        heapq.heappush(self._by_cost_desc, (-cost, item, version))
+        heapq.heappush(self._by_efficiency, (-efficiency, item, version))
+
+    def _top(self, heap):
+        """
+        Drop stale entries from the top of heap and return the top entry.
+        """
+        while heap[0][2] != self._versions[heap[0][1]]:
+            heapq.heappop(heap)
+        return heap[0]
+
+    def build_items(self):
+        """
+        Return the list of buildable items.
+        """
+        return self._build_info.build_items()
+
+    def get_cost(self, item):
+        """
+        Return the current cost of item.
+        """
+        return self._build_info.get_cost(item)
+
+    def get_cps(self, item):
+        """
+        Return the cps of item.
+        """
+        return self._build_info.get_cps(item)
+
+    def update_item(self, item):
+        """
+        Update the cost of item after a purchase and reindex it.
+        """
+        self._build_info.update_item(item)
+        self._versions[item] += 1
+        if len(self._by_cost) > 4 * len(self._versions):
+            self._rebuild()
+        else:
+            self._push(item)
+
+    def clone(self):
+        """
+        Return an indexed clone.
+        """
+        return IndexedBuildInfo(self._build_info)
+
+    def cheapest(self):
+        """
+        Return (cost, item) for the cheapest item.
+        """
+        cost, item, dummy_version = self._top(self._by_cost)
+        return (cost, item)
+
+    def most_expensive(self):
+        """
+        Return (cost, item) for the most expensive item.
+        """
+        cost, item, dummy_version = self._top(self._by_cost_desc)
+        return (-cost, item)
+
+    def most_efficient(self):
+        """
+        Return (cps / cost, item) for the most efficient item.
+        """
+        efficiency, item, dummy_version = self._top(self._by_efficiency)
+        return (-efficiency, item)
+
+#end of the class IndexedBuildInfo
+
+
 def simulate_clicker(build_info, duration, strategy):
     """
     Function to run a Cookie Clicker game for the given
@@ -129,7 +416,7 @@ def simulate_clicker(build_info, duration, strategy):
     my_clickerState = ClickerState()
     
     while duration >= 0:
-        item = strategy(my_clickerState.get_cookies(), my_clickerState.get_cps(), my_clickerState.get_history(), duration - my_clickerState.get_time(), my_build_info)
+        item = strategy(my_clickerState.get_cookies(), my_clickerState.get_cps(), my_clickerState.get_history(), duration, my_build_info)
         if item == None:
             break
         item_cost = my_build_info.get_cost(item)
@@ -173,6 +460,12 @@ def strategy_cheap(cookies, cps, history, time_left, build_info):
     """
     Always buy the cheapest item you can afford in the time left.
     """
+    if isinstance(build_info, IndexedBuildInfo):
+        cheapest_cost, name = build_info.cheapest()
+        if cheapest_cost <= (cookies + cps * time_left):
+            return name
+        return None
+
     cost_of_item = {}
     for item in build_info.build_items():
         cost_of_item[item] = build_info.get_cost(item)
@@ -187,6 +480,12 @@ def strategy_expensive(cookies, cps, history, time_left, build_info):
     """
     Always buy the most expensive item you can afford in the time left.
     """
+    if isinstance(build_info, IndexedBuildInfo):
+        most_expensive_cost, name = build_info.most_expensive()
+        if most_expensive_cost <= (cookies + cps * time_left):
+            return name
+        return None
+
     cost_of_item = {}
     name = None
     
@@ -202,6 +501,12 @@ def strategy_best(cookies, cps, history, time_left, build_info):
     """
     The best strategy that you are able to implement.
     """
+    if isinstance(build_info, IndexedBuildInfo):
+        max_efficiency, name = build_info.most_efficient()
+        if max_efficiency > 0:
+            return name
+        return None
+
     item_lst = build_info.build_items()
   
     max_efficiency = 0
@@ -214,19 +519,339 @@ def strategy_best(cookies, cps, history, time_left, build_info):
             most_efficient_item = item
             
     return most_efficient_item
+
+
+def make_strategy_best(weight = 1.0, lookahead = 0):
+    """
+    Return a strategy that generalizes strategy_best.
+
+    Items are ranked by cps / cost ** weight, so weight above 1.0 favours
+    cheap items and below 1.0 expensive ones.  With lookahead above 0,
+    every sequence of lookahead purchases that can be made in the time
+    left is completed by a rollout to the end that keeps buying by that
+    ranking, and the first item of the sequence that produces the most
+    cookies is picked; this is make_strategy_planner without a budget.
+    """
+    if lookahead > 0:
+        return make_strategy_planner(lookahead, None, weight)
+
+    def strategy(cookies, cps, history, time_left, build_info):
+        """
+        Parameterized strategy_best, see make_strategy_best.
+        """
+        best_item = None
+        best_efficiency = 0
+        for item in build_info.build_items():
+            efficiency = float(build_info.get_cps(item)) / build_info.get_cost(item) ** weight
+            if efficiency > best_efficiency:
+                best_efficiency = efficiency
+                best_item = item
+        return best_item
+
+    return strategy
+
+
+def _greedy_rollout(costs, gains, growth, now, cookies, cps, produced, end, deadline = None, weight = 1.0):
+    """
+    Keep buying the item with the highest gain / cost ** weight from the
+    given node until end, as strategy_best does for weight 1.0, with
+    costs multiplied by growth after each purchase.  Return the cookies
+    produced by end, or None if the deadline passes first.
+    """
+    costs = list(costs)
+    while True:
+        if deadline != None and timer.time() > deadline:
+            return None
+        best_idx = None
+        max_efficiency = 0
+        for idx in range(len(costs)):
+            efficiency = gains[idx] / costs[idx] ** weight
+            if efficiency > max_efficiency:
+                max_efficiency = efficiency
+                best_idx = idx
+        if best_idx == None:
+            break
+        cost = costs[best_idx]
+        wait_time = _wait_time(cookies, cps, cost)
+        if now + wait_time > end:
+            break
+        now += wait_time
+        produced += cps * wait_time
+        cookies += cps * wait_time
+        cookies -= cost
+        cps += gains[best_idx]
+        costs[best_idx] = cost * growth[best_idx]
+    return produced + cps * (end - now)
+
+
+def _production_bound(costs, gains, now, cookies, cps, produced, end):
+    """
+    Return an upper bound on the cookies produced by end from a node.
+    Costs only grow, so no purchase is ever more efficient than the best
+    current one, e; reinvesting every cookie at once at that rate grows
+    cps at most as (cps + e * cookies) * exp(e * t).
+    """
+    efficiency = max([gains[idx] / costs[idx] for idx in range(len(costs))])
+    remaining = end - now
+    if efficiency <= 0:
+        return produced + cps * remaining
+    if efficiency * remaining > 700:
+        return float('inf')
+    return produced + (cps + efficiency * cookies) * (math.exp(efficiency * remaining) - 1) / efficiency
+
+
+class _PlanSearch:
+    """
+    Depth-limited branch-and-bound over purchase sequences, with leaves
+    valued by a _greedy_rollout to the end.
+
+    Nodes with the same purchase counts are memoized, so that a node
+    dominated by an earlier one is pruned.  Counts can only repeat when
+    items are bought in a different order, so this prunes nothing at
+    depth 1 and only pays off from depth 2.
+    """
+
+    def __init__(self, gains, growth, end, deadline, weight = 1.0):
+        """
+        Set up a search over items with the given cps gains and cost
+        growth factors, until time end, stopping at deadline (None for
+        no limit), with rollouts and ordering by gain / cost ** weight.
+        """
+        self._gains = gains
+        self._growth = growth
+        self._end = end
+        self._deadline = deadline
+        self._weight = weight
+        self._reached = {}
+        self.best_value = float('-inf')
+
+    def search(self, counts, costs, now, cookies, cps, produced, depth):
+        """
+        Return the best value found from a node, or -inf if it was pruned
+        or the deadline passed.
+        """
+        # a node is dominated by an earlier one with the same purchases,
+        # reached no later and with no fewer cookies
+        seen = self._reached.get(counts)
+        if seen != None and seen[0] <= now and seen[1] >= cookies:
+            return float('-inf')
+        self._reached[counts] = (now, cookies)
+
+        if depth == 0:
+            value = _greedy_rollout(costs, self._gains, self._growth, now, cookies, cps, produced, self._end, self._deadline, self._weight)
+            if value == None:
+                return float('-inf')
+            self.best_value = max(self.best_value, value)
+            return value
+
+        best = produced + cps * (self._end - now)
+        self.best_value = max(self.best_value, best)
+        for idx in self.order(costs):
+            if self.out_of_time():
+                break
+            child = self.child(counts, costs, now, cookies, cps, produced, idx)
+            if child == None or self.bound(child) <= self.best_value:
+                continue
+            best = max(best, self.search(*(child + (depth - 1,))))
+        return best
+
+    def out_of_time(self):
+        """
+        Return whether the deadline has passed.
+        """
+        return self._deadline != None and timer.time() > self._deadline
+
+    def bound(self, node):
+        """
+        Return _production_bound of a node returned by child.
+        """
+        dummy_counts, costs, now, cookies, cps, produced = node
+        return _production_bound(costs, self._gains, now, cookies, cps, produced, self._end)
+
+    def order(self, costs):
+        """
+        Return item indices by decreasing efficiency, the rollout's first.
+        """
+        return sorted(range(len(costs)), key = lambda idx: -self._gains[idx] / costs[idx] ** self._weight)
+
+    def child(self, counts, costs, now, cookies, cps, produced, idx):
+        """
+        Return the node reached by buying item idx, or None if it cannot
+        be bought before the end.
+        """
+        cost = costs[idx]
+        wait_time = _wait_time(cookies, cps, cost)
+        if now + wait_time > self._end:
+            return None
+        new_counts = counts[:idx] + (counts[idx] + 1,) + counts[idx + 1:]
+        new_costs = list(costs)
+        new_costs[idx] = cost * self._growth[idx]
+        return (new_counts, new_costs, now + wait_time,
+                cookies + cps * wait_time - cost, cps + self._gains[idx],
+                produced + cps * wait_time)
+
+#end of the class _PlanSearch
+
+
+def make_strategy_planner(depth = PLAN_DEPTH, budget = PLAN_BUDGET, weight = 1.0):
+    """
+    Return a strategy that plans its purchases instead of following
+    strategy_best greedily.
+
+    Every purchase sequence of length depth is searched by branch and
+    bound, and each is completed by a rollout to the end of time_left
+    that keeps buying the item with the highest cps / cost ** weight, as
+    strategy_best does for weight 1.0, so wait times and the end of the
+    game are accounted for exactly.  Nodes are pruned when an upper
+    bound on their production cannot beat the best value found, or when
+    another path reached the same purchases sooner with more cookies.
+    Items are tried in the rollout's order and the search, rollouts
+    included, stops after budget seconds (never if budget is None); if
+    no sequence was valued by then, the first item in that order that
+    can be bought in time is picked.
+    """
+    def strategy(cookies, cps, history, time_left, build_info):
+        """
+        Planning strategy, see make_strategy_planner.
+        """
+        items = list(build_info.build_items())
+        costs = [float(build_info.get_cost(item)) for item in items]
+        gains = [float(build_info.get_cps(item)) for item in items]
+        growth = []
+        probe = build_info.clone()
+        for idx in range(len(items)):
+            probe.update_item(items[idx])
+            growth.append(probe.get_cost(items[idx]) / costs[idx])
+
+        deadline = None
+        if budget != None:
+            deadline = timer.time() + budget
+        planner = _PlanSearch(gains, growth, time_left, deadline, weight)
+        counts = (0,) * len(items)
+        fallback = None
+        best_item = None
+        best_value = float('-inf')
+        for idx in planner.order(costs):
+            child = planner.child(counts, costs, 0.0, cookies, cps, 0.0, idx)
+            if child == None:
+                continue
+            if fallback == None:
+                fallback = items[idx]
+            if planner.out_of_time():
+                break
+            if best_item != None and planner.bound(child) <= best_value:
+                continue
+            value = planner.search(*(child + (depth - 1,)))
+            if value > best_value:
+                best_value = value
+                best_item = items[idx]
+        if best_item == None:
+            return fallback
+        return best_item
+
+    return strategy
+
+
+strategy_planner = make_strategy_planner()
+
+
+# Strategies whose choice only depends on the build info, mapped to
+# (key, checks_budget, floor): they pick the item with the highest
+# key(cost, cps) if that key is unique and above floor, and if
+# checks_budget they return None when it costs more than
+# cookies + cps * time_left
+STATIONARY = {strategy_cheap: (lambda cost, cps: -cost, True, float('-inf')),
+              strategy_expensive: (lambda cost, cps: cost, True, float('-inf')),
+              strategy_best: (lambda cost, cps: float(cps) / float(cost), False, 0)}
+
+
+def _stationary_heap(build_info, key):
+    """
+    Return a heap of (-key(cost, cps), item) entries for the items of
+    build_info, with the highest key on top.
+    """
+    heap = [(-key(build_info.get_cost(item), build_info.get_cps(item)), item)
+            for item in build_info.build_items()]
+    heapq.heapify(heap)
+    return heap
+
+
+def simulate_clicker_fast(build_info, duration, strategy, max_history = None):
+    """
+    Function to run a Cookie Clicker game for the given duration with
+    the given strategy, with the same result as simulate_clicker.
+
+    A strategy in STATIONARY is replaced by a heap of its item keys.
+    Only the key of the item bought changes, so the top entry is
+    replaced in O(log n) after each purchase, and whole runs of
+    purchases are made without calling the strategy or passing it the
+    history; it is only called when the two highest keys tie.  The
+    waits and purchases are still made one by one so that the floating
+    point state matches simulate_clicker exactly.  max_history bounds
+    the stored history, see ClickerHistory.
+    """
+    if strategy not in STATIONARY:
+        return simulate_clicker(build_info, duration, strategy)
+
+    key, checks_budget, floor = STATIONARY[strategy]
+    my_build_info = build_info.clone()
+    my_clickerState = ClickerState(max_history)
+    heap = _stationary_heap(my_build_info, key)
+
+    get_cost = my_build_info.get_cost
+    get_cps = my_build_info.get_cps
+    update_item = my_build_info.update_item
+    time_until = my_clickerState.time_until
+    wait = my_clickerState.wait
+    buy_item = my_clickerState.buy_item
+
+    while duration >= 0:
+        cookies = my_clickerState.get_cookies()
+        cps = my_clickerState.get_cps()
+        time_left = duration
+        top, item = heap[0]
+        # the second highest key is in one of the children of the top
+        tied = len(heap) > 1 and min(heap[1:3])[0] == top
+        if -top > floor and not tied:
+            item_cost = get_cost(item)
+            if checks_budget and item_cost > cookies + cps * time_left:
+                break
+        else:
+            item = strategy(cookies, cps, my_clickerState.get_history(), time_left, my_build_info)
+            if item == None:
+                break
+            item_cost = get_cost(item)
+
+        wait_time = time_until(item_cost)
+        if duration < wait_time:
+            break
+        duration -= wait_time
+        wait(wait_time)
+        buy_item(item, item_cost, get_cps(item))
+        update_item(item)
+
+        if item == heap[0][1]:
+            heapq.heapreplace(heap, (-key(get_cost(item), get_cps(item)), item))
+        else:
+            heap = _stationary_heap(my_build_info, key)
+
+    my_clickerState.wait(duration)
+
+    return my_clickerState
     
     
 def run_strategy(strategy_name, time, strategy):
     """
     Run a simulation for the given time with one strategy.
     """
-    state = simulate_clicker(provided.BuildInfo(), time, strategy)
+    state = simulate_clicker_fast(provided.BuildInfo(), time, strategy)
     print strategy_name, ":", state
 
     # Plot total cookies over time
     history = state.get_history()
-    history_item0_item3 = [(item[0],item[3]) for item in history]
-    simpleplot.plot_lines(strategy_name, 1000, 400, 'Time', 'Total Cookies', [history_item0_item3], True)
+    history_item0_item3 = history.plot_points(PLOT_POINTS)
+    if simpleplot != None:
+        simpleplot.plot_lines(strategy_name, 1000, 400, 'Time', 'Total Cookies', [history_item0_item3], True)
 
 def run():
     """
@@ -2,10 +2,26 @@
 Simulator for greedy boss scenario
 """
 
-import simpleplot
 import math
-import codeskulptor
-codeskulptor.set_timeout(20)
+
+# simpleplot and codeskulptor only exist in CodeSkulptor; without them
+# the simulator still runs headless
+try:
+    import simpleplot
+except ImportError:
+    simpleplot = None
+
+try:
+    import codeskulptor
+    codeskulptor.set_timeout(20)
+except ImportError:
+    codeskulptor = None
+
+# numpy is only needed by the vectorized simulator, greedy_boss_sweep
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 STANDARD = True
 LOGLOG = False
@@ -15,10 +31,26 @@ INITIAL_SALARY = 100
 SALARY_INCREMENT = 100
 INITIAL_BRIBE_COST = 1000
 
+# columns of the array returned by greedy_boss_sweep
+DAY = 0         # day of the last bribe
+EARNINGS = 1    # total salary earned by that day
+BRIBES = 2      # number of bribes paid
 
-def greedy_boss(days_in_simulation, bribe_cost_increment, plot_type = STANDARD):
+# scenarios below which greedy_boss_sweep runs them one by one, since a
+# vectorized step costs as much as a whole scalar run of a few hundred
+SWEEP_MIN_BATCH = 200
+
+# largest value any column of greedy_boss_sweep may hold before a step; a
+# step never produces intermediates more than a few times its inputs, so
+# this keeps the int64 arithmetic exact
+SWEEP_LIMIT = 2 ** 60
+
+
+def iter_greedy_boss(days_in_simulation, bribe_cost_increment):
     """
-    Simulation of greedy boss
+    Simulation of greedy boss as a generator: lazily yields the
+    (day, total salary earned) event of the start and of every bribe,
+    using constant memory however long the simulation runs
     """
     
     # initialize necessary local variables
@@ -28,8 +60,7 @@ def greedy_boss(days_in_simulation, bribe_cost_increment, plot_type = STANDARD):
     current_bribe_cost = INITIAL_BRIBE_COST
     current_salary = INITIAL_SALARY
     
-    # initialize list consisting of days vs. total salary earned for analysis
-    days_vs_earnings = [(0, 0)]
+    yield (0, 0)
 
     # Each iteration of this while loop simulates one bribe
     while current_day < days_in_simulation:
@@ -51,17 +82,177 @@ def greedy_boss(days_in_simulation, bribe_cost_increment, plot_type = STANDARD):
         current_bribe_cost += bribe_cost_increment
         current_salary += SALARY_INCREMENT
 
-        # update list with days vs total salary earned for most recent bribe
-        # use plot_type to control whether regular or log/log plot
-        if plot_type == STANDARD:
-            days_vs_earnings.append((current_day, total_salary_earned))
-        else:
-            days_vs_earnings.append([math.log(current_day),    math.log(total_salary_earned)/float(9.5*(math.log(current_day)**4))    ])
-        
-   
+        yield (current_day, total_salary_earned)
+
+
+def loglog(events):
+    """
+    Pipeline stage turning (day, earnings) events into the log/log points
+    (log(day), log(earnings) / (9.5 * log(day) ** 4)) used by LOGLOG plots;
+    events without a defined point, such as the starting (0, 0), are dropped
+    """
+    for day, earnings in events:
+        if day <= 1 or earnings <= 0:
+            continue
+        log_day = math.log(day)
+        yield (log_day, math.log(earnings) / float(9.5 * (log_day ** 4)))
+
+
+def decimate(events, step):
+    """
+    Pipeline stage keeping every step-th event, and the last one
+    """
+    event = None
+    for index, event in enumerate(events):
+        if index % step == 0:
+            yield event
+    if event != None and index % step != 0:
+        yield event
+
+
+def geometric_decimate(events, ratio):
+    """
+    Pipeline stage keeping an event only once its day is at least ratio
+    times the day of the last event kept, and the last one, so that the
+    events kept are evenly spread on a log scale
+    """
+    last_kept = None
+    event = None
+    for event in events:
+        if last_kept == None or event[0] >= last_kept[0] * ratio:
+            last_kept = event
+            yield event
+    if event != None and event is not last_kept:
+        yield event
+
+
+def greedy_boss(days_in_simulation, bribe_cost_increment, plot_type = STANDARD):
+    """
+    Simulation of greedy boss
+    """
+    events = iter_greedy_boss(days_in_simulation, bribe_cost_increment)
+
+    # use plot_type to control whether regular or log/log plot
+    if plot_type == STANDARD:
+        return list(events)
+    days_vs_earnings = [next(events)]
+    days_vs_earnings.extend([list(point) for point in loglog(events)])
     return days_vs_earnings
 
 
+def _burst_size(savings, bribe_cost, bribe_cost_increment):
+    """
+    Return, for arrays of states, how many bribes are paid in a row
+    without waiting: the number of j >= 0 with
+    savings - (j + 1) * cost - increment * j * (j + 1) / 2 >= 0.
+    The root of that quadratic gives an estimate, which is then corrected
+    with exact integer checks.
+    """
+    def fits(count):
+        """
+        Return where bribe number count (from 0) of the burst is paid.
+        """
+        return savings - (count + 1) * bribe_cost - bribe_cost_increment * count * (count + 1) // 2 >= 0
+
+    half = bribe_cost_increment / 2.0
+    linear = bribe_cost + half
+    constant = (bribe_cost - savings).astype(float)
+    with numpy.errstate(divide = "ignore", invalid = "ignore"):
+        root = numpy.where(bribe_cost_increment > 0,
+                           (numpy.sqrt(linear * linear - 4 * half * constant) - linear) / (2 * half),
+                           -constant / linear)
+    count = numpy.maximum(numpy.floor(root).astype(numpy.int64) + 1, 0)
+    while True:
+        too_many = (count > 0) & ~fits(count - 1)
+        if not too_many.any():
+            break
+        count -= too_many
+    while True:
+        too_few = fits(count)
+        if not too_few.any():
+            break
+        count += too_few
+    return count
+
+
+def _last_event(days_in_simulation, bribe_cost_increment):
+    """
+    Run iter_greedy_boss for one scenario and return the [DAY, EARNINGS,
+    BRIBES] row of its last event
+    """
+    bribes = -1
+    for day, earnings in iter_greedy_boss(days_in_simulation, bribe_cost_increment):
+        bribes += 1
+    return [day, earnings, bribes]
+
+
+def greedy_boss_sweep(days_in_simulation, bribe_cost_increment):
+    """
+    Simulate greedy_boss for every pair of day horizon and bribe cost
+    increment at once.  The arguments are numpy arrays (or scalars) that
+    broadcast together, and every scenario advances one waiting bribe
+    per step.  The bribes paid without waiting, which follow each other
+    on the same day with costs in arithmetic progression, are counted in
+    closed form by _burst_size, so a step costs the same however many
+    bribes are paid that day.  Each waiting bribe is still one step of
+    about twenty numpy calls, so fewer than SWEEP_MIN_BATCH scenarios
+    are run one by one with iter_greedy_boss instead.
+
+    Only the final state of each scenario is returned, not its bribe
+    schedule: an int64 array with one row per scenario, in broadcast
+    order, holding the DAY, EARNINGS and BRIBES of the last entry
+    greedy_boss would return.  Without numpy, the arguments must be
+    sequences of the same length and a list of rows is returned.
+    OverflowError is raised once any column of the vectorized state
+    reaches SWEEP_LIMIT, as happens quickly with increment 0, where the
+    bribes paid each day grow exponentially.
+    """
+    if numpy == None:
+        return [_last_event(days, increment)
+                for days, increment in zip(days_in_simulation, bribe_cost_increment)]
+
+    horizon, increment = numpy.broadcast_arrays(numpy.asarray(days_in_simulation, dtype = numpy.int64),
+                                                numpy.asarray(bribe_cost_increment, dtype = numpy.int64))
+    horizon = horizon.ravel()
+    increment = increment.ravel()
+    size = len(horizon)
+    if size < SWEEP_MIN_BATCH:
+        rows = [_last_event(int(horizon[idx]), int(increment[idx])) for idx in range(size)]
+        return numpy.array(rows, dtype = numpy.int64).reshape(size, 3)
+
+    day = numpy.zeros(size, dtype = numpy.int64)
+    savings = numpy.zeros(size, dtype = numpy.int64)
+    earnings = numpy.zeros(size, dtype = numpy.int64)
+    bribes = numpy.zeros(size, dtype = numpy.int64)
+    bribe_cost = numpy.full(size, INITIAL_BRIBE_COST, dtype = numpy.int64)
+    salary = numpy.full(size, INITIAL_SALARY, dtype = numpy.int64)
+
+    active = numpy.flatnonzero(day < horizon)
+    while len(active) > 0:
+        for column in (day, savings, earnings, bribe_cost, salary, bribes):
+            if column.max() >= SWEEP_LIMIT:
+                raise OverflowError("greedy_boss_sweep exceeded int64")
+
+        # wait for and pay the next bribe
+        wait = (bribe_cost[active] - savings[active] + salary[active] - 1) // salary[active]
+        day[active] += wait
+        savings[active] += wait * salary[active] - bribe_cost[active]
+        earnings[active] += wait * salary[active]
+        bribe_cost[active] += increment[active]
+        salary[active] += SALARY_INCREMENT
+        bribes[active] += 1
+
+        # pay every bribe that needs no waiting on the same day
+        active = active[day[active] < horizon[active]]
+        count = _burst_size(savings[active], bribe_cost[active], increment[active])
+        savings[active] -= count * bribe_cost[active] + increment[active] * count * (count - 1) // 2
+        bribe_cost[active] += count * increment[active]
+        salary[active] += count * SALARY_INCREMENT
+        bribes[active] += count
+
+    return numpy.column_stack([day, earnings, bribes])
+
+
 def run_simulations():
     """
     Run simulations for several possible bribe increments
@@ -72,9 +263,10 @@ def run_simulations():
     inc_500 = greedy_boss(days, 500, plot_type)
     inc_1000 = greedy_boss(days, 1000, plot_type)
     inc_2000 = greedy_boss(days, 2000, plot_type)
-    simpleplot.plot_lines("Greedy boss", 600, 600, "days", "total earnings", 
-                          [ inc_0 ], False,
-                         ["Bribe increment = 0"])
+    if simpleplot != None:
+        simpleplot.plot_lines("Greedy boss", 600, 600, "days", "total earnings", 
+                              [ inc_0 ], False,
+                             ["Bribe increment = 0"])
     
     #print inc_1000
     print
@@ -82,7 +274,7 @@ def run_simulations():
     #print float(inc_1000[6][1]-inc_1000[5][1])/(inc_1000[6][0]-inc_1000[5][0])
     #print float(inc_1000[5][1]-inc_1000[4][1])/(inc_1000[5][0]-inc_1000[4][0])
 
-run_simulations()
+#run_simulations()
 
 #print greedy_boss(35, 100)
 # should print [(0, 0), (10, 1000), (16, 2200), (20, 3400), (23, 4600), (26, 6100), (29, 7900), (31, 9300), (33, 10900), (35, 12700)]
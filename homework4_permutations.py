@@ -1,19 +1,19 @@
+import itertools
+
+def iter_all_sequences(outcomes, length):
+    """
+    Generator that lazily yields all sequences of outcomes of
+    given length, as tuples
+    """
+    return itertools.product(outcomes, repeat = length)
+
+
 def gen_all_sequences(outcomes, length):
     """
     Iterative function that enumerates the set of all sequences of
     outcomes of given length
     """
-    
-    ans = set([()])
-    for dummy_idx in range(length):
-        temp = set()
-        for seq in ans:
-            for item in outcomes:
-                new_seq = list(seq)
-                new_seq.append(item)
-                temp.add(tuple(new_seq))
-        ans = temp
-    return ans
+    return set(iter_all_sequences(outcomes, length))
 
 # example for digits
 def run_example1():
@@ -39,12 +39,9 @@ def gen_permutations(outcomes, length):
     outcomes of length num_trials
     No repeated outcomes allowed
     """
-    ans = set([()])
-    ans = gen_all_sequences(outcomes, length)
-    
     ans_no_repetition_list=[]
     
-    for e in ans:
+    for e in iter_all_sequences(outcomes, length):
         set_e = set(e)
         if (len(set_e)==4):
             ans_no_repetition_list.append(e)    
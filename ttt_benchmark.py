@@ -0,0 +1,295 @@
+"""
+Headless benchmarks for the Monte Carlo Tic-Tac-Toe player.
+
+Run as a script to time TTTBoard.check_win, TTTBoard.clone, mc_trial,
+mc_update_scores, get_best_move and mc_move over a range of board sizes,
+trial counts and reverse mode, or to compare the temporaries created by a
+playout of mc_trial with those of the preallocated mc_trial_fast.
+Prints a JSON report, or writes it to the file given with --output.
+"""
+
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import time
+from timeit import default_timer
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+import Tic_Tac_Toe_Monte_Carlo as ttt
+
+PLAYOUTS = 2000
+REPEAT = 200
+DIMS = (3, 4, 5, 6, 7, 8)
+TRIALS = (10, 100)
+SEED = 1
+
+
+def _collections():
+    """
+    Return the number of generation 0 collections run so far,
+    or None if this Python does not report it.
+    """
+    if not hasattr(gc, "get_stats"):
+        return None
+    return gc.get_stats()[0]["collections"]
+
+
+def playout_allocations(trial_function, dim, playouts = PLAYOUTS):
+    """
+    Play playouts random games from an empty dim x dim board with
+    trial_function and return a dictionary of per-playout figures:
+    seconds, the mean peak of temporary bytes held above the starting
+    point (Python 3.9+), and generation 0 collections per 1000 playouts.
+    """
+    board = ttt.TTTBoard(dim)
+    trial_function(board.clone(), ttt.PLAYERX)
+    gc.collect()
+
+    collections = _collections()
+    boards = [board.clone() for dummy_idx in range(playouts)]
+    start = time.time()
+    for cloned in boards:
+        trial_function(cloned, ttt.PLAYERX)
+    elapsed = time.time() - start
+
+    result = {"function": trial_function.__name__,
+              "dim": dim,
+              "playouts": playouts,
+              "seconds_per_playout": elapsed / playouts,
+              "peak_temporary_bytes": None,
+              "gen0_collections_per_1000": None}
+    if collections != None:
+        result["gen0_collections_per_1000"] = (
+            1000.0 * (_collections() - collections) / playouts)
+
+    # traced separately, tracing slows the playouts down
+    if tracemalloc != None and hasattr(tracemalloc, "reset_peak"):
+        boards = [board.clone() for dummy_idx in range(playouts)]
+        total = 0
+        tracemalloc.start()
+        for cloned in boards:
+            tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+            trial_function(cloned, ttt.PLAYERX)
+            total += tracemalloc.get_traced_memory()[1] - current
+        tracemalloc.stop()
+        result["peak_temporary_bytes"] = float(total) / playouts
+    return result
+
+
+def run_allocation_benchmark(dims = (3, 4, 5, 6, 7, 8), playouts = PLAYOUTS):
+    """
+    Compare mc_trial and mc_trial_fast on every board size in dims.
+    """
+    results = []
+    for dim in dims:
+        for trial_function in (ttt.mc_trial, ttt.mc_trial_fast):
+            results.append(playout_allocations(trial_function, dim, playouts))
+    return results
+
+
+def _percentile(ordered, fraction):
+    """
+    Return the nearest-rank percentile of an ordered list of samples.
+    """
+    rank = int(round(fraction * (len(ordered) - 1)))
+    return ordered[rank]
+
+
+def _midgame_board(dim, reverse, rng):
+    """
+    Return a dim x dim board with about half of the squares taken
+    by random moves and no winner yet.
+    """
+    while True:
+        board = ttt.TTTBoard(dim, reverse)
+        player = ttt.PLAYERX
+        for dummy_move in range(dim * dim // 2):
+            row, col = rng.choice(board.get_empty_squares())
+            board.move(row, col, player)
+            player = ttt.provided.switch_player(player)
+        if board.check_win() == None:
+            return board
+
+
+def _finished_board(board, rng):
+    """
+    Return a copy of board played out to the end by mc_trial.
+    """
+    finished = board.clone()
+    ttt.mc_trial(finished, ttt.PLAYERX, rng)
+    return finished
+
+
+def _time_calls(call, arguments):
+    """
+    Call call once for each entry of arguments and return the sorted
+    list of per-call latencies in seconds.
+    """
+    latencies = []
+    for argument in arguments:
+        start = default_timer()
+        call(argument)
+        latencies.append(default_timer() - start)
+    latencies.sort()
+    return latencies
+
+
+def _peak_bytes(call, arguments):
+    """
+    Return the peak number of bytes traced while making the calls,
+    or None if tracemalloc is not available.
+    """
+    if tracemalloc == None:
+        return None
+    tracemalloc.start()
+    for argument in arguments:
+        call(argument)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def bench_case(name, dim, reverse, repeat, trials = None, seed = SEED):
+    """
+    Benchmark one function on dim x dim boards and return a dictionary
+    with its calls per second, playouts per second when it plays games,
+    latency percentiles in seconds and peak traced bytes.
+    """
+    rng = random.Random(seed)
+    board = _midgame_board(dim, reverse, rng)
+    player = ttt.PLAYERX
+    playouts_per_call = 0
+
+    if name == "check_win":
+        call = lambda board: board.check_win()
+        make = lambda: board
+    elif name == "clone":
+        call = lambda board: board.clone()
+        make = lambda: board
+    elif name == "mc_trial":
+        call = lambda board: ttt.mc_trial(board, player)
+        make = lambda: board.clone()
+        playouts_per_call = 1
+    elif name == "mc_update_scores":
+        scores = [[0 for dummy_col in range(dim)] for dummy_row in range(dim)]
+        call = lambda board: ttt.mc_update_scores(scores, board, player)
+        make = lambda: _finished_board(board, rng)
+    elif name == "get_best_move":
+        scores = [[rng.randrange(-trials, trials + 1) for dummy_col in range(dim)]
+                  for dummy_row in range(dim)]
+        call = lambda board: ttt.get_best_move(board, scores)
+        make = lambda: board
+    elif name == "mc_move":
+        call = lambda board: ttt.mc_move(board, player, trials)
+        make = lambda: board
+        playouts_per_call = trials
+    else:
+        raise ValueError("unknown benchmark " + name)
+
+    arguments = [make() for dummy_idx in range(repeat)]
+    gc.collect()
+    latencies = _time_calls(call, arguments)
+    total = sum(latencies)
+
+    # traced separately, tracing slows the calls down
+    traced = [make() for dummy_idx in range(min(repeat, 20))]
+    result = {"function": name,
+              "dim": dim,
+              "reverse": reverse,
+              "trials": trials,
+              "calls": repeat,
+              "calls_per_sec": None,
+              "playouts_per_sec": None,
+              "latency_p50": _percentile(latencies, 0.5),
+              "latency_p90": _percentile(latencies, 0.9),
+              "latency_p99": _percentile(latencies, 0.99),
+              "peak_bytes": _peak_bytes(call, traced)}
+    if total > 0:
+        result["calls_per_sec"] = repeat / total
+        if playouts_per_call:
+            result["playouts_per_sec"] = playouts_per_call * repeat / total
+    return result
+
+
+def run_hot_path_benchmark(dims = DIMS, trial_counts = TRIALS, repeat = REPEAT,
+                           seed = SEED):
+    """
+    Benchmark every hot-path function for each board size in dims, with
+    and without reverse mode.  get_best_move and mc_move are run for each
+    trial count, mc_move for repeat // 10 moves.
+    """
+    results = []
+    for dim in dims:
+        for reverse in (False, True):
+            for name in ("check_win", "clone", "mc_trial", "mc_update_scores"):
+                results.append(bench_case(name, dim, reverse, repeat, None, seed))
+            for trials in trial_counts:
+                results.append(bench_case("get_best_move", dim, reverse,
+                                          repeat, trials, seed))
+                results.append(bench_case("mc_move", dim, reverse,
+                                          max(repeat // 10, 1), trials, seed))
+    return results
+
+
+def _environment():
+    """
+    Return a dictionary describing the interpreter and machine.
+    """
+    info = {"python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "time": time.time()}
+    if resource != None:
+        info["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return info
+
+
+def main(argv = None):
+    """
+    Parse the command line, run the chosen suites and write the report.
+    """
+    parser = argparse.ArgumentParser(description = "Benchmark the Monte Carlo Tic-Tac-Toe player.")
+    parser.add_argument("--suite", choices = ("hot", "allocations", "all"),
+                        default = "hot")
+    parser.add_argument("--dims", type = int, nargs = "+", default = list(DIMS))
+    parser.add_argument("--trials", type = int, nargs = "+", default = list(TRIALS))
+    parser.add_argument("--repeat", type = int, default = REPEAT)
+    parser.add_argument("--playouts", type = int, default = PLAYOUTS)
+    parser.add_argument("--seed", type = int, default = SEED)
+    parser.add_argument("--output")
+    args = parser.parse_args(argv)
+
+    report = {}
+    if args.suite in ("hot", "all"):
+        report["hot_path"] = run_hot_path_benchmark(args.dims, args.trials,
+                                                    args.repeat, args.seed)
+    if args.suite in ("allocations", "all"):
+        report["allocations"] = run_allocation_benchmark(args.dims, args.playouts)
+    report["environment"] = _environment()
+
+    text = json.dumps(report, indent = 2, sort_keys = True) + "\n"
+    if args.output:
+        output = open(args.output, "w")
+        try:
+            output.write(text)
+        finally:
+            output.close()
+    else:
+        sys.stdout.write(text)
+
+
+if __name__ == "__main__":
+    main()
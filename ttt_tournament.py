@@ -0,0 +1,241 @@
+"""
+Headless self-play tournaments for the Monte Carlo Tic-Tac-Toe player.
+
+Two players, each a move function of Tic_Tac_Toe_Monte_Carlo with a trial
+count and optional SCORE_CURRENT/SCORE_OTHER values, play a number of
+games, swapping X and O every game.  Games are played in seeded chunks on
+a pool of worker processes, every result is appended to a compact binary
+log as it arrives, and the win and draw rates are reported with Wilson
+confidence intervals.
+
+Example:
+    python ttt_tournament.py --player mc_move:10 --player mc_move:100:1.0:2.0
+        --games 100000 --log games.bin
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import random
+import sys
+from array import array
+
+import Tic_Tac_Toe_Monte_Carlo as ttt
+
+# outcomes from the point of view of the first player
+FIRST_WINS = 0
+SECOND_WINS = 1
+DRAW = 2
+
+CHUNK = 500     # Games per seeded work unit
+Z_95 = 1.96     # Normal quantile of the reported confidence intervals
+
+# move functions that start their own process pool, which the daemonic
+# workers of run_tournament are not allowed to do
+POOL_PLAYERS = ("mc_move_parallel",)
+
+
+def _number(text):
+    """
+    Return text as an int, or as a float such as a time budget in
+    seconds if it is not a whole number.
+    """
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def parse_player(text):
+    """
+    Turn "function:trials[:score_current:score_other]" into a player
+    tuple (function name, trials, score_current, score_other).  For
+    timed move functions such as mcts_move_timed, trials is the time
+    budget in seconds.
+    """
+    fields = text.split(":")
+    if len(fields) not in (2, 4):
+        raise ValueError("player should be function:trials[:current:other], got " + text)
+    if not callable(getattr(ttt, fields[0], None)):
+        raise ValueError("no move function named " + fields[0])
+    if len(fields) == 2:
+        return (fields[0], _number(fields[1]), ttt.SCORE_CURRENT, ttt.SCORE_OTHER)
+    return (fields[0], _number(fields[1]), float(fields[2]), float(fields[3]))
+
+
+def play_game(player_x, player_o, dim, reverse):
+    """
+    Play one game between two player tuples, player_x moving first,
+    and return the result of check_win on the final board.  The
+    SCORE_CURRENT and SCORE_OTHER values of the players are set while
+    they move and restored afterwards.
+    """
+    board = ttt.TTTBoard(dim, reverse)
+    players = {ttt.PLAYERX: player_x, ttt.PLAYERO: player_o}
+    mark = ttt.PLAYERX
+    saved_scores = (ttt.SCORE_CURRENT, ttt.SCORE_OTHER)
+    try:
+        while board.check_win() == None:
+            name, trials, score_current, score_other = players[mark]
+            ttt.SCORE_CURRENT = score_current
+            ttt.SCORE_OTHER = score_other
+            row, col = getattr(ttt, name)(board, mark, trials)
+            board.move(row, col, mark)
+            mark = ttt.provided.switch_player(mark)
+    finally:
+        ttt.SCORE_CURRENT, ttt.SCORE_OTHER = saved_scores
+    return board.check_win()
+
+
+def _play_chunk(task):
+    """
+    Play a (first, second, dim, reverse, games, seed, index) work unit and
+    return one byte per game: outcome * 2 + 1 if the first player was X.
+    """
+    first, second, dim, reverse, games, seed, index = task
+    random.seed(seed * 1000003 + index)
+    if ttt.numpy != None:
+        ttt.numpy.random.seed((seed * 1000003 + index) % 2 ** 32)
+    results = array("B")
+    for game in range(games):
+        first_is_x = (index * CHUNK + game) % 2 == 0
+        if first_is_x:
+            winner = play_game(first, second, dim, reverse)
+        else:
+            winner = play_game(second, first, dim, reverse)
+        if winner == ttt.DRAW:
+            outcome = DRAW
+        elif (winner == ttt.PLAYERX) == first_is_x:
+            outcome = FIRST_WINS
+        else:
+            outcome = SECOND_WINS
+        results.append(outcome * 2 + int(first_is_x))
+    return results
+
+
+def wilson_interval(successes, total, z_score = Z_95):
+    """
+    Return the (low, high) Wilson score interval of a binomial rate.
+    """
+    if total == 0:
+        return (0.0, 1.0)
+    rate = float(successes) / total
+    denominator = 1.0 + z_score * z_score / total
+    centre = rate + z_score * z_score / (2.0 * total)
+    margin = z_score * math.sqrt(rate * (1.0 - rate) / total
+                                 + z_score * z_score / (4.0 * total * total))
+    return ((centre - margin) / denominator, (centre + margin) / denominator)
+
+
+def summarize(results):
+    """
+    Return a dictionary of counts, rates and confidence intervals for an
+    array of game bytes, overall and split by who played X.
+    """
+    counts = [0] * 6
+    for code in results:
+        counts[code] += 1
+    total = len(results)
+    summary = {"games": total}
+    for label, outcome in (("first_wins", FIRST_WINS),
+                           ("second_wins", SECOND_WINS),
+                           ("draws", DRAW)):
+        number = counts[outcome * 2] + counts[outcome * 2 + 1]
+        summary[label] = number
+        summary[label + "_rate"] = float(number) / total if total else 0.0
+        summary[label + "_ci"] = wilson_interval(number, total)
+        summary[label + "_as_x"] = counts[outcome * 2 + 1]
+    return summary
+
+
+def read_log(path):
+    """
+    Return (header, results) from a log written by run_tournament.
+    """
+    log = open(path, "rb")
+    try:
+        header = json.loads(log.readline().decode("utf-8"))
+        data = log.read()
+    finally:
+        log.close()
+    results = array("B")
+    if hasattr(results, "frombytes"):
+        results.frombytes(data)
+    else:
+        results.fromstring(data)
+    return header, results
+
+
+def run_tournament(first, second, games, dim = 3, reverse = False,
+                   workers = None, seed = 0, log_path = None):
+    """
+    Play games games between two player tuples on a pool of workers
+    (all cores by default, 1 plays in this process) and return the
+    summary.  Players in POOL_PLAYERS always play in this process, as
+    they run their own pool.  Results are appended to log_path, after a one-line JSON
+    header, as they arrive.
+    """
+    tasks = []
+    for index, start in enumerate(range(0, games, CHUNK)):
+        tasks.append((first, second, dim, reverse, min(CHUNK, games - start),
+                      seed, index))
+
+    log = None
+    if log_path != None:
+        log = open(log_path, "wb")
+        header = {"first": first, "second": second, "games": games,
+                  "dim": dim, "reverse": reverse, "seed": seed}
+        log.write((json.dumps(header) + "\n").encode("utf-8"))
+
+    if first[0] in POOL_PLAYERS or second[0] in POOL_PLAYERS:
+        workers = 1
+    pool = None
+    if workers == 1:
+        chunks = (_play_chunk(task) for task in tasks)
+    else:
+        pool = multiprocessing.Pool(workers)
+        chunks = pool.imap(_play_chunk, tasks)
+
+    results = array("B")
+    try:
+        for chunk in chunks:
+            results.extend(chunk)
+            if log != None:
+                chunk.tofile(log)
+                log.flush()
+    finally:
+        if pool != None:
+            pool.close()
+            pool.join()
+        if log != None:
+            log.close()
+    return summarize(results)
+
+
+def main(argv = None):
+    """
+    Parse the command line, run the tournament and print the summary as JSON.
+    """
+    parser = argparse.ArgumentParser(description = "Self-play Tic-Tac-Toe tournament.")
+    parser.add_argument("--player", action = "append", required = True,
+                        help = "function:trials[:score_current:score_other], give two")
+    parser.add_argument("--games", type = int, default = 1000)
+    parser.add_argument("--dim", type = int, default = 3)
+    parser.add_argument("--reverse", action = "store_true")
+    parser.add_argument("--workers", type = int)
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--log")
+    args = parser.parse_args(argv)
+    if len(args.player) != 2:
+        parser.error("give exactly two --player options")
+
+    summary = run_tournament(parse_player(args.player[0]),
+                             parse_player(args.player[1]),
+                             args.games, args.dim, args.reverse,
+                             args.workers, args.seed, args.log)
+    sys.stdout.write(json.dumps(summary, indent = 2, sort_keys = True) + "\n")
+
+
+if __name__ == "__main__":
+    main()